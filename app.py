@@ -1,474 +1,2379 @@
-# app.py
-import os
-import json
-import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
-import pandas as pd
-from datetime import datetime
-
-# -----------------------
-# CONFIG
-# -----------------------
-SHEET_ID = "1dO7a3evLEu7ONM5NQ1L7IQBt60xXJmsvvo0SS6rWZic"
-SERVICE_ACCOUNT_FILE = "service_account.json"
-
-# -----------------------
-# INITIALIZE SESSION STATE
-# -----------------------
-if "logged_in" not in st.session_state:
-    st.session_state.logged_in = False
-if "user" not in st.session_state:
-    st.session_state.user = None
-if "role" not in st.session_state:
-    st.session_state.role = None
-if "cache" not in st.session_state:
-    st.session_state.cache = {}
-if "force_rerun" not in st.session_state:
-    st.session_state.force_rerun = False
-
-
-# -----------------------
-# INITIALIZE SESSION STATE
-# -----------------------
-for key in ["logged_in", "user", "role", "cache"]:
-    if key not in st.session_state:
-        if key == "cache":
-            st.session_state[key] = {}
-        else:
-            st.session_state[key] = None if key != "logged_in" else False
-
-# -----------------------
-# GOOGLE SHEETS AUTHENTICATION
-# -----------------------
-import json, os
-import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
-
-def authenticate_gsheets(sheet_id: str):
-    """Authenticate to Google Sheets using either:
-       1. SERVICE_ACCOUNT_JSON environment variable (Render, Streamlit Cloud)
-       2. service_account.json file (local)"""
-
-    scopes = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive"
-    ]
-
-    creds = None
-
-    try:
-        # --- Option A: Environment variable (Render safe)
-        if os.getenv("SERVICE_ACCOUNT_JSON"):
-            raw = os.getenv("SERVICE_ACCOUNT_JSON")
-            try:
-                data = json.loads(raw)
-            except json.JSONDecodeError:
-                st.error("❌ SERVICE_ACCOUNT_JSON is not valid JSON.")
-                st.stop()
-
-            # Fix escaped newlines
-            if "private_key" in data and "\\n" in data["private_key"]:
-                data["private_key"] = data["private_key"].replace("\\n", "\n")
-
-            creds = Credentials.from_service_account_info(data, scopes=scopes)
-
-        # --- Option B: Local file (for local testing)
-        elif os.path.exists("service_account.json"):
-            creds = Credentials.from_service_account_file("service_account.json", scopes=scopes)
-        else:
-            st.error("❌ No credentials found. Provide SERVICE_ACCOUNT_JSON (env var) or service_account.json file.")
-            st.stop()
-
-        # Authorize client
-        client = gspread.authorize(creds)
-        spreadsheet = client.open_by_key(sheet_id)
-        st.success("✅ Google Sheets authentication successful!")
-        return spreadsheet
-
-    except gspread.SpreadsheetNotFound:
-        st.error(
-            "❌ Spreadsheet not found. Ensure SHEET_ID is correct and "
-            "the service account email has **Editor** access."
-        )
-        st.stop()
-    except Exception as e:
-        st.error(
-            f"❌ Failed to authenticate to Google Sheets.\n\n"
-            "Possible causes:\n"
-            "1️⃣ SERVICE_ACCOUNT_JSON not formatted correctly\n"
-            "2️⃣ Missing line breaks in private_key (Render issue)\n"
-            "3️⃣ Sheet not shared with service account\n"
-            "4️⃣ Invalid SHEET_ID\n\n"
-            f"Error: {e}"
-        )
-        st.stop()
-# -----------------------
-# OPEN SHEET
-# -----------------------
-spreadsheet = authenticate_gsheets(SHEET_ID)
-
-# -----------------------
-# SHEETS SETUP
-# -----------------------
-sheets_info = {
-    "users": ["username","password","role","email","phone"],
-    "students": ["username","name","department","email","phone","attendance_percentage",
-                 "tution_fee_status","hostel_fee_status","exam_fee_status","transport_fee_status",
-                 "books_issued","hostel_room"],
-    "faculty": ["username","name","department","email","phone"],
-    "requests": ["username","role","request_type","details","status","timestamp"],
-    "payments": ["username","fee_type","amount","date","status"],
-    "notifications": ["notification","date"],
-    "recent_activity": ["username","role","action","timestamp"]
-}
-
-worksheet_objs = {}
-for name, header in sheets_info.items():
-    try:
-        ws = spreadsheet.worksheet(name)
-        existing_header = ws.row_values(1)
-        if existing_header != header:
-            if existing_header:
-                ws.delete_rows(1)
-            ws.insert_row(header, index=1)
-    except gspread.WorksheetNotFound:
-        ws = spreadsheet.add_worksheet(title=name, rows=500, cols=20)
-        ws.insert_row(header, index=1)
-    worksheet_objs[name] = ws
-
-def ws_by_name(name):
-    return worksheet_objs[name]
-
-# -----------------------
-# UTILITIES
-# -----------------------
-def safe_get_all_records(ws, sheet_name):
-    try:
-        records = ws.get_all_records(expected_headers=sheets_info[sheet_name])
-        return pd.DataFrame(records) if records else pd.DataFrame(columns=sheets_info[sheet_name])
-    except gspread.exceptions.APIError:
-        st.warning(f"Quota exceeded while reading {sheet_name}, returning empty dataframe.")
-        return pd.DataFrame(columns=sheets_info[sheet_name])
-
-def load_all_once():
-    for name in sheets_info.keys():
-        st.session_state.cache[name] = safe_get_all_records(ws_by_name(name), name)
-
-# Helper functions
-def append_row(sheet_name, row):
-    ws_by_name(sheet_name).append_row(row)
-    refresh_single(sheet_name)
-
-def refresh_single(sheet_name):
-    st.session_state.cache[sheet_name] = safe_get_all_records(ws_by_name(sheet_name), sheet_name)
-
-def update_cell(sheet_name, row_idx, col_name, value):
-    ws = ws_by_name(sheet_name)
-    col_idx = sheets_info[sheet_name].index(col_name) + 1
-    ws.update_cell(row_idx + 2, col_idx, value)  # +2 for header
-    refresh_single(sheet_name)
-
-def delete_user(username):
-    ws = ws_by_name("users")
-    users = st.session_state.cache["users"]
-    idx = users[users["username"]==username].index
-    if not idx.empty:
-        ws.delete_rows(idx[0]+2)
-        refresh_single("users")
-
-def find_row_index_by_key(sheet_name, key_col, key_val):
-    df = st.session_state.cache.get(sheet_name, pd.DataFrame())
-    idx = df[df[key_col]==key_val].index
-    return idx[0] if not idx.empty else None
-
-def log_activity_local(user, role, action):
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    append_row("recent_activity", [user, role, action, ts])
-
-# -----------------------
-# DEMO USERS
-# -----------------------
-def ensure_demo_data():
-    users_df = st.session_state.cache.get("users", pd.DataFrame())
-    demo_users = [
-        ["admin","pass123","Admin","admin@example.com","999000501"],
-        ["student1","pass123","Student","student1@example.com","999000111"],
-        ["student2","pass123","Student","student2@example.com","999000112"],
-        ["librarian","pass123","Librarian","lib@example.com","999000301"],
-        ["warden","pass123","Hostel Warden","warden@example.com","999000401"],
-    ]
-    existing = users_df["username"].str.lower().tolist() if not users_df.empty else []
-    for u in demo_users:
-        if u[0].lower() not in existing:
-            ws_by_name("users").append_row(u)
-
-load_all_once()
-ensure_demo_data()
-
-# -----------------------
-# AUTHENTICATION FUNCTIONS
-# -----------------------
-def authenticate(username, password):
-    users = st.session_state.cache.get("users")
-    if users is None or users.empty:
-        load_all_once()
-        users = st.session_state.cache.get("users")
-    uname = username.strip().lower()
-    pwd = password.strip()
-    users["username_norm"] = users["username"].str.strip().str.lower()
-    users["password"] = users["password"].str.strip()
-    matched = users[(users["username_norm"]==uname)&(users["password"]==pwd)]
-    if not matched.empty:
-        row = matched.iloc[0]
-        return row["role"], row["username"]
-    return None, None
-
-def reset_login():
-    st.session_state.logged_in = False
-    st.session_state.user = None
-    st.session_state.role = None
-
-# -----------------------
-# STREAMLIT UI
-# -----------------------
-st.set_page_config(page_title="EcoOne ERP", layout="wide")
-st.title("EcoOne ERP Prototype")
-
-# Sidebar reset
-if st.sidebar.button("Reset Login / Logout"):
-    reset_login()
-
-menu = ["Login","Sign Up"]
-choice = st.sidebar.selectbox("Menu", menu)
-
-# -----------------------
-# SIGN UP
-# -----------------------
-if choice == "Sign Up":
-    st.subheader("Create Account")
-    su_username = st.text_input("Username", key="su_username")
-    su_password = st.text_input("Password", type="password", key="su_password")
-    su_role = st.selectbox("Role", ["Student","Faculty","Librarian","Hostel Warden","Admin"], key="su_role")
-    su_email = st.text_input("Email", key="su_email")
-    su_phone = st.text_input("Phone", key="su_phone")
-    if st.button("Create Account", key="create_account"):
-        users = st.session_state.cache.get("users", pd.DataFrame(columns=sheets_info["users"]))
-        existing = users["username"].str.lower().tolist() if not users.empty else []
-        if su_username.strip().lower() in existing:
-            st.error("Username already exists.")
-        else:
-            append_row("users",[su_username.strip(), su_password.strip(), su_role, su_email.strip(), su_phone.strip()])
-            st.success("Account created successfully! You can now login.")
-
-# -----------------------
-# LOGIN
-# -----------------------
-elif choice == "Login":
-    st.subheader("Login")
-    li_username = st.text_input("Username", key="login_username")
-    li_password = st.text_input("Password", type="password", key="login_password")
-    if st.button("Login", key="login_btn"):
-        role, canon_user = authenticate(li_username, li_password)
-        if role:
-            st.session_state.logged_in = True
-            st.session_state.user = canon_user
-            st.session_state.role = role
-            st.success(f"Logged in as {canon_user} ({role})")
-            load_all_once()  # refresh cache to show dashboard
-        else:
-            st.error("Invalid username or password.")
-
-# -----------------------
-# POST-LOGIN DASHBOARD
-# -----------------------
-if st.session_state.logged_in:
-    user = st.session_state.user
-    role = st.session_state.role
-    st.sidebar.markdown(f"**Logged in as:** {user} ({role})")
-    if st.sidebar.button("Logout"):
-        reset_login()
-
-    
-    st.subheader(f"Welcome, {user}!")
-    if role=="Admin":
-        st.subheader("Admin Dashboard")
-        tabs = st.tabs(["Overview","Manage Users","Recent Activity"])
-        
-
-        with tabs[0]:
-             st.subheader("Overview")
-
-             # --- Users
-             users_df = st.session_state.cache.get("users", pd.DataFrame())
-             total_students = users_df[
-                 users_df["role"].astype(str).str.strip().str.lower() == "student"
-             ].shape[0] if not users_df.empty else 0
-         
-             # --- Payments
-             payments_df = st.session_state.cache.get("payments", pd.DataFrame())
-             students_df = st.session_state.cache.get("students", pd.DataFrame())
-
-             if payments_df is None or payments_df.empty:
-                 pending_payments_df = pd.DataFrame(columns=["username","fee_type","amount","date","status"])
-             else:
-                 # Normalize the status column
-                 payments_df["status_norm"] = payments_df["status"].astype(str).str.strip().str.lower()
-                 pending_payments_df = payments_df[payments_df["status_norm"] == "pending"]
-
-             pending_count = len(pending_payments_df)
-
-             st.metric("Total Students", total_students)
-             st.metric("Total Payments", len(payments_df) if payments_df is not None else 0)
-             st.metric("Pending Payments", pending_count)
-
-             # --- Students with pending payments
-             if not pending_payments_df.empty:
-                 if students_df is not None and not students_df.empty:
-                     # Merge to get student details
-                     merged = pd.merge(
-                         pending_payments_df,
-                         students_df[["username","name","department"]],
-                         on="username",
-                         how="left"
-                     )
-                     display_df = merged[["name","department","fee_type","amount","date","status"]].fillna("")
-                     st.markdown("### Students with Pending Payments")
-                     st.dataframe(display_df)
-                 else:
-                     st.info("Student details not available.")
-             else:
-                st.info("No pending payments.")
-
-
-
-        with tabs[1]:
-            st.markdown("### Users")
-            users_df = st.session_state.cache.get("users",pd.DataFrame())
-            st.dataframe(users_df.fillna(""))
-
-            st.markdown("#### Add User")
-            uu = st.text_input("Username",key="admin_user_add")
-            upw = st.text_input("Password",type="password",key="admin_user_pass")
-            urole = st.selectbox("Role",["Student","Faculty","Librarian","Hostel Warden","Admin"],key="admin_user_role")
-            if st.button("Add User",key="admin_user_add_btn"):
-                append_row("users",[uu,upw,urole,"",""])
-                refresh_single("users")
-                st.session_state.force_rerun = not st.session_state.force_rerun
-                st.success("User added.")
-
-            st.markdown("#### Delete User")
-            del_user = st.selectbox("Select User to Delete", users_df["username"].tolist() if not users_df.empty else [], key="del_user")
-            if st.button("Delete User",key="del_user_btn"):
-                delete_user(del_user)
-
-        with tabs[2]:
-            st.markdown("### Recent Activity")
-            recent_df = st.session_state.cache.get("recent_activity",pd.DataFrame())
-            st.dataframe(recent_df.fillna(""))
-
-    # -----------------------
-    # Student Dashboard
-    # -----------------------
-    elif role=="Student":
-        st.subheader("Student Dashboard")
-        students = st.session_state.cache.get("students",pd.DataFrame())
-        idx = find_row_index_by_key("students","username",user)
-        if idx is not None:
-            row = students.loc[idx]
-            st.write("**Personal Info**")
-            st.write(row[["name","department","email","phone"]])
-            st.write("**Fees Status**")
-            st.write(row[["tution_fee_status","hostel_fee_status","exam_fee_status","transport_fee_status"]])
-            st.write("**Books Issued:**",row.get("books_issued",""))
-            st.write("**Hostel Room:**",row.get("hostel_room",""))
-
-            st.subheader("Submit Requests")
-            req_type = st.selectbox("Request Type", ["Library", "Hostel"], key="stu_req_type")
-            details = st.text_input("Details", key="stu_req_details")
-            if st.button("Submit Request", key="submit_req_btn"):
-                if details.strip():
-                    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    append_row("requests",[user, role, req_type, details.strip(), "Pending", ts])
-                    st.success(f"{req_type} request submitted successfully.")
-                    log_activity_local(user, role, f"Submitted {req_type} request: {details.strip()}")
-                    refresh_single("requests")
-                else:
-                    st.error("Please enter request details.")
-
-    # -----------------------
-    # Librarian Dashboard
-    # -----------------------
-    elif role=="Librarian":
-        st.subheader("Librarian Dashboard")
-        reqs = st.session_state.cache.get("requests",pd.DataFrame())
-        pending_lib = reqs[(reqs["request_type"]=="Library")&(reqs["status"]=="Pending")]
-        st.markdown("### Pending Library Requests")
-        if not pending_lib.empty:
-            for i,r in pending_lib.iterrows():
-                st.write(f"{r['username']} | {r['details']}")
-                c1,c2 = st.columns(2)
-                with c1:
-                    if st.button(f"Approve_{i}",key=f"lib_app_{i}"):
-                        update_cell("requests",i,"status","Approved")
-                        sidx = find_row_index_by_key("students","username",r["username"])
-                        if sidx is not None:
-                            cur = st.session_state.cache["students"].at[sidx,"books_issued"]
-                            new_val = (str(cur)+","+str(r["details"])).strip(",") if cur else r["details"]
-                            update_cell("students",sidx,"books_issued",new_val)
-                        log_activity_local(user,role,f"Approved library request {r['username']}")
-                        st.session_state.force_rerun = not st.session_state.force_rerun
-                with c2:
-                    if st.button(f"Reject_{i}",key=f"lib_rej_{i}"):
-                        update_cell("requests",i,"status","Rejected")
-                        log_activity_local(user,role,f"Rejected library request {r['username']}")
-                        st.session_state.force_rerun = not st.session_state.force_rerun
-        else:
-            st.info("No pending library requests")
-        st.markdown("### Assigned Books Overview")
-        students = st.session_state.cache.get("students", pd.DataFrame())
-        assigned_books = students[students["books_issued"].notna() & (students["books_issued"]!="")]
-        if not assigned_books.empty:
-            st.dataframe(assigned_books[["name","department","books_issued"]])
-        else:
-            st.info("No books assigned yet.")
- 
-
-    # -----------------------
-    # Hostel Warden Dashboard
-    # -----------------------
-    elif role=="Hostel Warden":
-        st.subheader("Hostel Warden Dashboard")
-        reqs = st.session_state.cache.get("requests",pd.DataFrame())
-        pending_hostel = reqs[(reqs["request_type"]=="Hostel")&(reqs["status"]=="Pending")]
-        st.markdown("### Pending Hostel Requests")
-        if not pending_hostel.empty:
-            for i,r in pending_hostel.iterrows():
-                st.write(f"{r['username']} | {r['details']}")
-                c1,c2 = st.columns(2)
-                with c1:
-                    if st.button(f"ApproveH_{i}",key=f"host_app_{i}"):
-                        update_cell("requests",i,"status","Approved")
-                        sidx = find_row_index_by_key("students","username",r["username"])
-                        assigned = r["details"] if any(ch.isdigit() for ch in r["details"]) else "Assigned-"+datetime.now().strftime("%Y%m%d%H%M%S")
-                        if sidx is not None:
-                            update_cell("students",sidx,"hostel_room",assigned)
-                        log_activity_local(user,role,f"Approved hostel request {r['username']}")
-                        st.session_state.force_rerun = not st.session_state.force_rerun
-                with c2:
-                    if st.button(f"RejectH_{i}",key=f"host_rej_{i}"):
-                        update_cell("requests",i,"status","Rejected")
-                        log_activity_local(user,role,f"Rejected hostel request {r['username']}")
-                        st.session_state.force_rerun = not st.session_state.force_rerun
-        else:
-            st.info("No pending hostel requests")
-        
-        st.markdown("### Assigned Hostel Rooms Overview")
-        students = st.session_state.cache.get("students", pd.DataFrame())
-        assigned_rooms = students[students["hostel_room"].notna() & (students["hostel_room"]!="")]
-        if not assigned_rooms.empty:
-            st.dataframe(assigned_rooms[["name","department","hostel_room"]])
-        else:
-            st.info("No hostel rooms assigned yet.")
-
+# app.py
+import os
+import io
+import json
+import atexit
+import bisect
+import collections
+import itertools
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import gspread
+import requests
+from google.oauth2.service_account import Credentials
+from gspread.utils import ValueInputOption, numericise_all, rightpad, rowcol_to_a1
+import math
+import numpy as np
+import openpyxl
+import pandas as pd
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is offered only when pyarrow is installed
+    pq = None
+from datetime import datetime, timedelta
+from sqlite_store import SqliteSpreadsheet, SqliteWorksheet
+
+# -----------------------
+# CONFIG
+# -----------------------
+SHEET_ID = "1dO7a3evLEu7ONM5NQ1L7IQBt60xXJmsvvo0SS6rWZic"
+SERVICE_ACCOUNT_FILE = "service_account.json"
+# "sheets" reads and writes the Google Sheet directly; "sqlite" keeps the data in a
+# local file (see sqlite_store.py) and can copy it to the Sheet in the background
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sheets")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "ecoone.db")
+SQLITE_MIRROR_INTERVAL = int(os.getenv("SQLITE_MIRROR_INTERVAL", "0"))  # seconds, 0 = off
+# recent_activity keeps this many days, and at most this many rows; older rows are archived
+ACTIVITY_HOT_DAYS = int(os.getenv("ACTIVITY_HOT_DAYS", "30"))
+ACTIVITY_HOT_ROWS = int(os.getenv("ACTIVITY_HOT_ROWS", "5000"))
+
+# -----------------------
+# INITIALIZE SESSION STATE
+# -----------------------
+if "logged_in" not in st.session_state:
+    st.session_state.logged_in = False
+if "user" not in st.session_state:
+    st.session_state.user = None
+if "role" not in st.session_state:
+    st.session_state.role = None
+if "force_rerun" not in st.session_state:
+    st.session_state.force_rerun = False
+
+
+# -----------------------
+# INITIALIZE SESSION STATE
+# -----------------------
+for key in ["logged_in", "user", "role"]:
+    if key not in st.session_state:
+        st.session_state[key] = None if key != "logged_in" else False
+
+# -----------------------
+# INSTRUMENTATION
+# -----------------------
+# Upper bounds (seconds) of the latency histogram buckets, Prometheus style
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICS_PATH = os.getenv("METRICS_PATH", "metrics")  # writes metrics.prom and metrics.json, "" = off
+METRICS_EXPORT_EVERY = 15  # seconds between file exports
+
+def payload_bytes(obj):
+    """Rough size of a request or response body: the text length of the values in it.
+
+    Value grids are summed cell by cell instead of being serialized, so sizing a
+    large read costs no copy of it.
+    """
+    if obj is None:
+        return 0
+    if isinstance(obj, dict):
+        return sum(payload_bytes(v) for v in obj.values())
+    if isinstance(obj, list) and obj and isinstance(obj[0], list):  # rows of cells
+        return sum(map(len, map(str, itertools.chain.from_iterable(obj))))
+    if isinstance(obj, (list, tuple)):  # e.g. a call's args
+        return sum(payload_bytes(v) for v in obj)
+    return len(str(obj))
+
+def new_stat():
+    return {"calls": 0, "errors": 0, "bytes": 0, "seconds": 0.0, "buckets": [0] * (len(LATENCY_BUCKETS) + 1)}
+
+def stat_quantile(stat, q):
+    """Upper bound of the bucket holding the q-th quantile (inf past the last bucket)."""
+    target, seen = q * stat["calls"], 0
+    for bound, n in zip(LATENCY_BUCKETS + (math.inf,), stat["buckets"]):
+        seen += n
+        if seen >= target:
+            return bound
+    return math.inf
+
+class Metrics:
+    """Process-wide counters and latency histograms for Sheets calls, cache lookups
+    and dashboard sections, with totals kept per session and per rerun.
+
+    Streamlit runs each rerun in its own thread, so the rerun being measured lives
+    in a thread-local; calls from the write-behind thread count for no session.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.time()
+        self.ops = {}  # (op, sheet) -> stat
+        self.sections = {}  # section name -> stat
+        self.cache = collections.Counter()  # (sheet, "hit" | "miss") -> lookups
+        self.sessions = collections.OrderedDict()  # session id -> Counter, most recent last
+        self.reruns = collections.deque(maxlen=200)
+        self.exported_at = 0.0
+
+    def _observe(self, table, key, seconds, nbytes=0, error=False):
+        stat = table.setdefault(key, new_stat())
+        stat["calls"] += 1
+        stat["errors"] += error
+        stat["bytes"] += nbytes
+        stat["seconds"] += seconds
+        stat["buckets"][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def _rerun(self):
+        return getattr(self.local, "rerun", None)
+
+    def _session(self, session):
+        """The session's totals; the least recently seen are dropped past 500 sessions."""
+        totals = self.sessions.get(session)
+        if totals is None:
+            totals = self.sessions[session] = collections.Counter()
+        self.sessions.move_to_end(session)
+        while len(self.sessions) > 500:  # sessions that never came back
+            self.sessions.popitem(last=False)
+        return totals
+
+    def record_call(self, op, sheet, seconds, nbytes=0, error=False):
+        with self.lock:
+            self._observe(self.ops, (op, sheet), seconds, nbytes, error)
+            rerun = self._rerun()
+            if rerun is not None:
+                rerun["api_calls"] += 1
+                rerun["api_seconds"] += seconds
+                self._session(rerun["session"])["api_calls"] += 1
+
+    @contextmanager
+    def timed(self, op, sheet="*"):
+        start, error = time.perf_counter(), False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.record_call(op, sheet, time.perf_counter() - start, error=error)
+
+    @contextmanager
+    def section(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self._observe(self.sections, name, time.perf_counter() - start)
+
+    def cache_lookup(self, sheet, hit):
+        result = "hit" if hit else "miss"
+        with self.lock:
+            self.cache[(sheet, result)] += 1
+            rerun = self._rerun()
+            if rerun is not None:
+                rerun[f"cache_{result}"] += 1
+                self._session(rerun["session"])[f"cache_{result}"] += 1
+
+    def queued_write(self, sheet, n=1):
+        with self.lock:
+            rerun = self._rerun()
+            if rerun is not None:
+                rerun["queued_writes"] += n
+                self._session(rerun["session"])["queued_writes"] += n
+
+    def start_rerun(self):
+        ctx = get_script_run_ctx()
+        session = ctx.session_id if ctx else "no-session"
+        self.local.rerun = {"session": session, "started": time.perf_counter(),
+                            "at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                            "api_calls": 0, "api_seconds": 0.0, "queued_writes": 0,
+                            "cache_hit": 0, "cache_miss": 0}
+        with self.lock:
+            self._session(session)["reruns"] += 1
+
+    def end_rerun(self, role):
+        """Close the rerun started in this thread; reruns cut short by st.rerun() are not counted."""
+        rerun = self._rerun()
+        if rerun is None:
+            return
+        self.local.rerun = None
+        seconds = time.perf_counter() - rerun.pop("started")
+        with self.lock:
+            self.reruns.append({**rerun, "role": role or "", "seconds": round(seconds, 4),
+                                "api_seconds": round(rerun["api_seconds"], 4)})
+            self._observe(self.sections, "rerun", seconds)
+            self._session(rerun["session"])["seconds"] += seconds
+        self.maybe_export()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "ops": [{"op": op, "sheet": sheet, **stat} for (op, sheet), stat in self.ops.items()],
+                "sections": [{"section": name, **stat} for name, stat in self.sections.items()],
+                "cache": [{"sheet": sheet, "result": result, "lookups": n} for (sheet, result), n in self.cache.items()],
+                "sessions": {sid: dict(c) for sid, c in self.sessions.items()},
+                "reruns": list(self.reruns),
+            }
+
+    def to_prometheus(self, snap=None):
+        snap = snap or self.snapshot()
+        lines = []
+
+        def histogram(name, help_text, stats, label_keys):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for stat in stats:
+                labels = ",".join(f'{k}="{stat[k]}"' for k in label_keys)
+                total = 0
+                for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), stat["buckets"]):
+                    total += n
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+                lines.append(f"{name}_sum{{{labels}}} {stat['seconds']:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {stat['calls']}")
+
+        def counter(name, help_text, rows):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in rows:
+                lines.append(f"{name}{{{labels}}} {value}")
+
+        histogram("ecoone_sheets_call_seconds", "Latency of Sheets API calls.", snap["ops"], ("op", "sheet"))
+        counter("ecoone_sheets_call_errors_total", "Sheets API calls that raised.",
+                [(f'op="{s["op"]}",sheet="{s["sheet"]}"', s["errors"]) for s in snap["ops"]])
+        counter("ecoone_sheets_call_bytes_total", "Approximate bytes sent or received by Sheets API calls.",
+                [(f'op="{s["op"]}",sheet="{s["sheet"]}"', s["bytes"]) for s in snap["ops"]])
+        counter("ecoone_cache_lookups_total", "Sheet cache lookups by result.",
+                [(f'sheet="{c["sheet"]}",result="{c["result"]}"', c["lookups"]) for c in snap["cache"]])
+        histogram("ecoone_section_seconds", "Time spent rendering dashboard sections and whole reruns.",
+                  snap["sections"], ("section",))
+        lines.append("# HELP ecoone_sessions Sessions seen by this process, up to the 500 most recent.")
+        lines.append("# TYPE ecoone_sessions gauge")
+        lines.append(f"ecoone_sessions {len(snap['sessions'])}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path=METRICS_PATH):
+        snap = self.snapshot()
+        for ext, text in ((".prom", self.to_prometheus(snap)), (".json", json.dumps(snap, indent=1))):
+            tmp = f"{path}{ext}.tmp"
+            with open(tmp, "w") as f:
+                f.write(text)
+            os.replace(tmp, path + ext)  # scrapers never see a half-written file
+
+    def maybe_export(self):
+        now = time.monotonic()
+        with self.lock:
+            if not METRICS_PATH or now - self.exported_at < METRICS_EXPORT_EVERY:
+                return
+            self.exported_at = now
+        try:
+            self.export()
+        except OSError:
+            pass  # metrics must never break the page
+
+def stat_table(stats, label_keys):
+    """One row per stat for the Diagnostics tab."""
+    return pd.DataFrame([
+        {**{k: s[k] for k in label_keys}, "calls": s["calls"], "errors": s["errors"],
+         "KB": round(s["bytes"] / 1024, 1), "avg ms": round(1000 * s["seconds"] / max(s["calls"], 1), 1),
+         "p50 ms": 1000 * stat_quantile(s, 0.5), "p99 ms": 1000 * stat_quantile(s, 0.99)}
+        for s in stats
+    ], columns=label_keys + ["calls", "errors", "KB", "avg ms", "p50 ms", "p99 ms"])
+
+@st.cache_resource
+def get_metrics():
+    return Metrics()
+
+metrics = get_metrics()
+metrics.start_rerun()
+
+# -----------------------
+# GOOGLE SHEETS AUTHENTICATION
+# -----------------------
+import json, os
+import streamlit as st
+import gspread
+from google.oauth2.service_account import Credentials
+
+def authenticate_gsheets(sheet_id: str):
+    """Authenticate to Google Sheets using either:
+       1. SERVICE_ACCOUNT_JSON environment variable (Render, Streamlit Cloud)
+       2. service_account.json file (local)"""
+
+    scopes = [
+        "https://www.googleapis.com/auth/spreadsheets",
+        "https://www.googleapis.com/auth/drive"
+    ]
+
+    creds = None
+
+    try:
+        # --- Option A: Environment variable (Render safe)
+        if os.getenv("SERVICE_ACCOUNT_JSON"):
+            raw = os.getenv("SERVICE_ACCOUNT_JSON")
+            try:
+                data = json.loads(raw)
+            except json.JSONDecodeError:
+                st.error("❌ SERVICE_ACCOUNT_JSON is not valid JSON.")
+                st.stop()
+
+            # Fix escaped newlines
+            if "private_key" in data and "\\n" in data["private_key"]:
+                data["private_key"] = data["private_key"].replace("\\n", "\n")
+
+            creds = Credentials.from_service_account_info(data, scopes=scopes)
+
+        # --- Option B: Local file (for local testing)
+        elif os.path.exists("service_account.json"):
+            creds = Credentials.from_service_account_file("service_account.json", scopes=scopes)
+        else:
+            st.error("❌ No credentials found. Provide SERVICE_ACCOUNT_JSON (env var) or service_account.json file.")
+            st.stop()
+
+        # Authorize client
+        client = gspread.authorize(creds)
+        spreadsheet = client.open_by_key(sheet_id)
+        st.success("✅ Google Sheets authentication successful!")
+        return spreadsheet
+
+    except gspread.SpreadsheetNotFound:
+        st.error(
+            "❌ Spreadsheet not found. Ensure SHEET_ID is correct and "
+            "the service account email has **Editor** access."
+        )
+        st.stop()
+    except Exception as e:
+        st.error(
+            f"❌ Failed to authenticate to Google Sheets.\n\n"
+            "Possible causes:\n"
+            "1️⃣ SERVICE_ACCOUNT_JSON not formatted correctly\n"
+            "2️⃣ Missing line breaks in private_key (Render issue)\n"
+            "3️⃣ Sheet not shared with service account\n"
+            "4️⃣ Invalid SHEET_ID\n\n"
+            f"Error: {e}"
+        )
+        st.stop()
+# -----------------------
+# SHEETS SETUP
+# -----------------------
+sheets_info = {
+    "users": ["username","password","role","email","phone"],
+    "students": ["username","name","department","email","phone","attendance_percentage",
+                 "tution_fee_status","hostel_fee_status","exam_fee_status","transport_fee_status",
+                 "books_issued","hostel_room"],
+    "faculty": ["username","name","department","email","phone"],
+    "requests": ["username","role","request_type","details","status","timestamp"],
+    "payments": ["username","fee_type","amount","date","status"],
+    "notifications": ["notification","date"],
+    "recent_activity": ["username","role","action","timestamp"],
+    # Counts of archived activity rows per day, role and kind of action
+    "activity_daily": ["date","role","action","count"]
+}
+
+# Bump when sheets_info changes so every running process re-checks the headers
+SCHEMA_VERSION = 2
+
+# Streamlit re-executes this file on every interaction, so the client and the
+# header check are kept per process. gspread's authorized session refreshes the
+# access token by itself when it expires.
+@st.cache_resource
+def get_spreadsheet(sheet_id, backend):
+    with metrics.timed("authenticate_gsheets"):
+        if backend == "sqlite":
+            return SqliteSpreadsheet(SQLITE_PATH)
+        return authenticate_gsheets(sheet_id)
+
+@st.cache_resource
+def get_worksheets(_spreadsheet, sheet_id, schema_version):
+    worksheet_objs = {}
+    for name, header in sheets_info.items():
+        with metrics.timed("sync_headers", name):
+            try:
+                ws = _spreadsheet.worksheet(name)
+                existing_header = ws.row_values(1)
+                if existing_header != header:
+                    if existing_header:
+                        ws.delete_rows(1)
+                    ws.insert_row(header, index=1)
+            except gspread.WorksheetNotFound:
+                ws = _spreadsheet.add_worksheet(title=name, rows=500, cols=20)
+                ws.insert_row(header, index=1)
+        worksheet_objs[name] = ws
+    return worksheet_objs
+
+@st.cache_resource
+def start_sheet_mirror(_store, _client, sheet_id, interval):
+    """Copy changed SQLite tables to the Google Sheet every ``interval`` seconds.
+
+    Returns the mirror's status: failures in a row and the last error, if any.
+    """
+    target = authenticate_gsheets(sheet_id)
+    status = {"failures": 0, "last_error": None}
+
+    def mirror_forever():
+        while True:
+            time.sleep(interval)
+            try:
+                _store.mirror_to(target, _client.call)
+            except Exception as e:  # keep the thread alive; the next round copies the same changes
+                status["failures"] += 1
+                status["last_error"] = f"{type(e).__name__}: {e}"
+            else:
+                status["failures"], status["last_error"] = 0, None
+
+    threading.Thread(target=mirror_forever, name="sqlite-mirror", daemon=True).start()
+    return status
+
+spreadsheet = get_spreadsheet(SHEET_ID, STORAGE_BACKEND)
+worksheet_objs = get_worksheets(spreadsheet, SHEET_ID, SCHEMA_VERSION)
+
+def ws_by_name(name):
+    return worksheet_objs[name]
+
+# -----------------------
+# SHARED SHEET CACHE
+# -----------------------
+# Seconds a cached sheet is served before it is read again. Writes made by this
+# process update the cache directly, so the TTL only limits how long edits made
+# in the Sheet itself take to appear.
+SHEET_TTL = {
+    "users": 300,
+    "students": 120,
+    "faculty": 600,
+    "requests": 30,
+    "payments": 60,
+    "notifications": 300,
+    "recent_activity": 30,
+    "activity_daily": 300,
+}
+DEFAULT_SHEET_TTL = 60
+
+# Sheets the app only ever appends to (apart from status updates it makes itself).
+# Refreshing them reads just the rows added since the last read; a full read still
+# happens every FULL_RESYNC_AFTER seconds or when the tail doesn't line up.
+APPEND_ONLY_SHEETS = {"recent_activity", "requests", "payments"}
+FULL_RESYNC_AFTER = 600
+
+class SheetIndex(ABC):
+    """Lookup structure kept in step with one cached sheet.
+
+    rebuild() runs after every full read. The on_* hooks follow single writes;
+    by default they rebuild too, subclasses override them to update in place.
+    """
+
+    @abstractmethod
+    def rebuild(self, df):
+        """Recompute the index from the whole frame."""
+
+    def on_append(self, df, start):
+        self.rebuild(df)
+
+    def on_update(self, df, row_idx, col_name):
+        self.rebuild(df)
+
+    def on_delete(self, df, row_idx, row):
+        self.rebuild(df)
+
+class SheetCache:
+    """One copy of every worksheet per process, shared by all sessions.
+
+    Frames always carry a 0..n-1 index so that ``row_idx + 2`` is the sheet row.
+    ``versions`` counts writes per sheet and ``version`` across all sheets.
+    Registered SheetIndex objects are updated under the same lock as the frames.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.frames = {}
+        self.loaded_at = {}
+        self.full_read_at = {}
+        self.versions = {}
+        self.version = 0
+        self.indexes = {}
+        self.memos = {}
+        # Sheet -> why it is served from an old (or empty) frame: its last read failed
+        self.stale = {}
+
+    def _bump(self, name):
+        self.versions[name] = self.versions.get(name, 0) + 1
+        self.version += 1
+
+    def _notify(self, name, hook, *args):
+        for sheet, index in self.indexes.values():
+            if sheet == name:
+                getattr(index, hook)(self.frames[name], *args)
+
+    def add_index(self, name, index_name, index):
+        with self.lock:
+            self.indexes[index_name] = (name, index)
+            if name in self.frames:
+                index.rebuild(self.frames[name])
+
+    def index(self, index_name):
+        return self.indexes[index_name][1]
+
+    def view(self, index_name, read):
+        """(frame, read(index)) taken under one lock, so the index describes that frame.
+
+        read must copy what it needs; writers may change the index right after.
+        """
+        with self.lock:
+            name, index = self.indexes[index_name]
+            return self.frames.get(name), read(index)
+
+    def memoize(self, key, sheet_names, build):
+        """Call build() once per combination of the given sheets' versions."""
+        with self.lock:
+            stamp = tuple(self.versions.get(n, 0) for n in sheet_names)
+            hit = self.memos.get(key)
+            if hit and hit[0] == stamp:
+                return hit[1]
+        value = build()
+        with self.lock:
+            self.memos[key] = (stamp, value)
+        return value
+
+    def is_fresh(self, name):
+        with self.lock:
+            if name not in self.frames:
+                return False
+            age = time.monotonic() - self.loaded_at[name]
+            return age < SHEET_TTL.get(name, DEFAULT_SHEET_TTL)
+
+    def get(self, name):
+        with self.lock:
+            return self.frames.get(name)
+
+    def put(self, name, df, seen_version=None):
+        with self.lock:
+            if seen_version is not None and self.versions.get(name, 0) != seen_version:
+                # Written to while we were reading, so the read may be missing that write
+                return
+            df = df.reset_index(drop=True)
+            self.loaded_at[name] = self.full_read_at[name] = time.monotonic()
+            self.stale.pop(name, None)
+            old = self.frames.get(name)
+            if old is not None and old.equals(df):
+                return  # nothing changed, so versions, indexes and memos stay valid
+            self.frames[name] = df
+            self._bump(name)
+            self._notify(name, "rebuild")
+
+    def extend(self, name, tail, seen_version=None):
+        """Add rows read from the end of the sheet since the last read."""
+        with self.lock:
+            if seen_version is not None and self.versions.get(name, 0) != seen_version:
+                return
+            if not tail.empty:
+                df = self.frames[name]
+                self.frames[name] = tail.reset_index(drop=True) if df.empty else pd.concat([df, tail], ignore_index=True)
+                self._bump(name)
+                self._notify(name, "on_append", len(df))
+            self.loaded_at[name] = time.monotonic()
+            self.stale.pop(name, None)
+
+    def mark_stale(self, name, retry_in, reason):
+        """Keep serving what we have (an empty frame if nothing) and retry in retry_in seconds."""
+        with self.lock:
+            if name not in self.frames:
+                self.frames[name] = pd.DataFrame(columns=sheets_info[name])
+                self.full_read_at[name] = float("-inf")
+                self._bump(name)
+                self._notify(name, "rebuild")
+            self.loaded_at[name] = time.monotonic() - SHEET_TTL.get(name, DEFAULT_SHEET_TTL) + retry_in
+            self.stale[name] = reason
+
+    def can_read_tail(self, name):
+        with self.lock:
+            return (name in APPEND_ONLY_SHEETS and name in self.frames
+                    and time.monotonic() - self.full_read_at[name] < FULL_RESYNC_AFTER)
+
+    def invalidate(self, name):
+        # Keep serving the old frame until the next read replaces it
+        with self.lock:
+            if name in self.loaded_at:
+                self.loaded_at[name] = self.full_read_at[name] = float("-inf")
+
+    def append(self, name, row):
+        # Cached the way the next read returns it, so the row does not change under us then
+        self.append_frame(name, frame_from_values(name, [[str(v) for v in row]]))
+
+    def append_frame(self, name, new_rows):
+        """Add rows this process is writing; one concat however many there are."""
+        with self.lock:
+            df = self.frames.get(name)
+            if df is None or new_rows.empty:
+                return
+            self.frames[name] = new_rows.reset_index(drop=True) if df.empty else pd.concat([df, new_rows], ignore_index=True)
+            self._bump(name)
+            self._notify(name, "on_append", len(df))
+
+    def set_value(self, name, row_idx, col_name, value):
+        with self.lock:
+            df = self.frames.get(name)
+            if df is None or row_idx not in df.index:
+                self.invalidate(name)
+                return
+            if df[col_name].dtype != object:
+                df[col_name] = df[col_name].astype(object)
+            df.at[row_idx, col_name] = value
+            self._bump(name)
+            self._notify(name, "on_update", row_idx, col_name)
+
+    def drop_row(self, name, row_idx):
+        with self.lock:
+            df = self.frames.get(name)
+            if df is None or row_idx not in df.index:
+                self.invalidate(name)
+                return
+            row = df.loc[row_idx]
+            self.frames[name] = df.drop(index=row_idx).reset_index(drop=True)
+            self._bump(name)
+            self._notify(name, "on_delete", row_idx, row)
+
+def norm_username(username):
+    return str(username).strip().lower()
+
+def norm_text(value):
+    return str(value).strip().lower()
+
+def activity_kind(action):
+    """What an activity row did, without its details: 'Submitted Library request: Book A'
+    -> 'Submitted library request'."""
+    words = str(action).split(":")[0].split()[:3]
+    return " ".join(words[:1] + [w.lower() for w in words[1:]])
+
+class UserIndex(SheetIndex):
+    """Normalized username -> (username, password, role) for the users sheet.
+
+    Sessions read ``by_name`` without the cache lock, so changes that remove
+    entries build a new dict and swap it in with one assignment.
+    """
+
+    def __init__(self):
+        self.by_name = {}
+
+    @staticmethod
+    def _add(by_name, username, password, role):
+        # First row wins, as it did with the old boolean-mask lookup
+        by_name.setdefault(norm_username(username), (username, str(password).strip(), role))
+
+    def rebuild(self, df):
+        by_name = {}
+        for username, password, role in zip(df["username"], df["password"], df["role"]):
+            self._add(by_name, username, password, role)
+        self.by_name = by_name
+
+    def on_append(self, df, start):
+        for username, password, role in zip(df["username"][start:], df["password"][start:], df["role"][start:]):
+            self._add(self.by_name, username, password, role)
+
+    def on_delete(self, df, row_idx, row):
+        key = norm_username(row["username"])
+        by_name = dict(self.by_name)
+        by_name.pop(key, None)
+        dupes = df[df["username"].map(norm_username) == key]
+        if not dupes.empty:
+            first = dupes.iloc[0]
+            self._add(by_name, first["username"], first["password"], first["role"])
+        self.by_name = by_name
+
+# Columns that identify a row, used to find the sheet row to write to
+KEY_COLUMNS = {
+    "users": ["username"],
+    "students": ["username"],
+    "requests": ["username", "request_type", "details", "timestamp"],
+}
+
+class KeyIndex(SheetIndex):
+    """Primary key -> row_idx (sheet row - 2) for one sheet.
+
+    Like UserIndex, ``rows`` is read without the cache lock; rebuilds and
+    deletes swap in a new dict rather than emptying the live one.
+    """
+
+    def __init__(self, key_cols):
+        self.key_cols = key_cols
+        self.rows = {}
+
+    @staticmethod
+    def _key(values):
+        return tuple(str(v) for v in values)
+
+    def _add_rows(self, rows, df, start):
+        columns = [df[c].iloc[start:] for c in self.key_cols]
+        for row_idx, *values in zip(range(start, len(df)), *columns):
+            rows.setdefault(self._key(values), row_idx)
+
+    def lookup(self, *key_vals):
+        return self.rows.get(self._key(key_vals))
+
+    def rebuild(self, df):
+        rows = {}
+        self._add_rows(rows, df, 0)
+        self.rows = rows
+
+    def on_append(self, df, start):
+        self._add_rows(self.rows, df, start)
+
+    def on_update(self, df, row_idx, col_name):
+        if col_name in self.key_cols:
+            self.rebuild(df)
+
+    def on_delete(self, df, row_idx, row):
+        # Rows below the deleted one move up by one
+        rows = {k: (i - 1 if i > row_idx else i) for k, i in self.rows.items() if i != row_idx}
+        key = self._key(row[c] for c in self.key_cols)
+        if key not in rows:
+            mask = pd.Series(True, index=df.index)
+            for col, val in zip(self.key_cols, key):
+                mask &= df[col].astype(str) == val
+            if mask.any():
+                rows[key] = int(mask.idxmax())
+        self.rows = rows
+
+class SortedIndex(SheetIndex):
+    """Row positions ordered by one column, plus memoized filter results.
+
+    Paged views slice a window out of ``order`` instead of sorting or copying the
+    whole frame on each rerun.
+    """
+
+    def __init__(self, sort_col):
+        self.sort_col = sort_col
+        self.order = np.array([], dtype=int)
+        self.filtered = {}
+
+    def rebuild(self, df):
+        self.order = np.argsort(df[self.sort_col].astype(str).to_numpy(), kind="stable")
+        self.filtered = {}
+
+    def on_append(self, df, start):
+        # Activity rows arrive in timestamp order, so they usually just go on the end
+        new = df[self.sort_col].iloc[start:].astype(str)
+        last = str(df[self.sort_col].iloc[self.order[-1]]) if len(self.order) else ""
+        if new.is_monotonic_increasing and new.iloc[0] >= last:
+            self.order = np.concatenate([self.order, np.arange(start, len(df))])
+            self.filtered = {}
+        else:
+            self.rebuild(df)
+
+class RoleCounts(SheetIndex):
+    """Number of users per normalized role."""
+
+    def __init__(self):
+        self.counts = collections.Counter()
+
+    def rebuild(self, df):
+        roles = df["role"].astype(str).str.strip().str.lower().astype("category")
+        self.counts = collections.Counter(roles.value_counts().to_dict())
+
+    def on_append(self, df, start):
+        self.counts.update(norm_text(r) for r in df["role"].iloc[start:])
+
+    def on_update(self, df, row_idx, col_name):
+        if col_name == "role":
+            self.rebuild(df)
+
+    def on_delete(self, df, row_idx, row):
+        self.counts[norm_text(row["role"])] -= 1
+
+class PaymentStats(SheetIndex):
+    """Payment count and pending payments by row, student and fee type."""
+
+    def __init__(self):
+        self.total = 0
+        self.pending = {}
+        self.by_user = collections.Counter()
+        self.by_fee = collections.Counter()
+
+    def _add(self, row_idx, username, fee_type, status):
+        if norm_text(status) == "pending":
+            self.pending[row_idx] = (username, fee_type)
+            self.by_user[username] += 1
+            self.by_fee[fee_type] += 1
+
+    def _remove(self, row_idx):
+        entry = self.pending.pop(row_idx, None)
+        if entry:
+            username, fee_type = entry
+            self.by_user[username] -= 1
+            self.by_fee[fee_type] -= 1
+            self.by_user += collections.Counter()  # drops zero counts
+            self.by_fee += collections.Counter()
+
+    def rebuild(self, df):
+        self.total = len(df)
+        status = df["status"].astype(str).str.strip().str.lower().astype("category")
+        pending = df[(status == "pending").to_numpy()]
+        self.pending = dict(zip(pending.index, zip(pending["username"], pending["fee_type"])))
+        self.by_user = collections.Counter(
+            pending.groupby(pending["username"].astype("category"), observed=True).size().to_dict())
+        self.by_fee = collections.Counter(
+            pending.groupby(pending["fee_type"].astype("category"), observed=True).size().to_dict())
+
+    def on_append(self, df, start):
+        self.total = len(df)
+        rows = zip(range(start, len(df)), df["username"].iloc[start:], df["fee_type"].iloc[start:], df["status"].iloc[start:])
+        for row_idx, username, fee_type, status in rows:
+            self._add(row_idx, username, fee_type, status)
+
+    def on_update(self, df, row_idx, col_name):
+        if col_name in ("username", "fee_type", "status"):
+            self._remove(row_idx)
+            self._add(row_idx, df.at[row_idx, "username"], df.at[row_idx, "fee_type"], df.at[row_idx, "status"])
+
+class PendingQueues(SheetIndex):
+    """request_type -> row_idx of its requests with status "Pending"."""
+
+    def __init__(self):
+        self.queues = {}
+
+    def _place(self, row_idx, request_type, status):
+        for rows in self.queues.values():
+            rows.discard(row_idx)
+        if status == "Pending":
+            self.queues.setdefault(request_type, set()).add(row_idx)
+
+    def rebuild(self, df):
+        pending = df[df["status"] == "Pending"]
+        self.queues = {t: set(rows) for t, rows in pending.groupby("request_type").groups.items()}
+
+    def on_append(self, df, start):
+        for row_idx, request_type, status in zip(range(start, len(df)), df["request_type"].iloc[start:], df["status"].iloc[start:]):
+            self._place(row_idx, request_type, status)
+
+    def on_update(self, df, row_idx, col_name):
+        if col_name in ("request_type", "status"):
+            self._place(row_idx, df.at[row_idx, "request_type"], df.at[row_idx, "status"])
+
+    def rows(self, request_type):
+        return sorted(self.queues.get(request_type, ()))
+
+class NonEmptyRows(SheetIndex):
+    """row_idx of rows where one column has a value, e.g. students with a hostel room."""
+
+    def __init__(self, col):
+        self.col = col
+        self.rows = set()
+
+    @staticmethod
+    def _filled(value):
+        return not pd.isna(value) and value != ""
+
+    def rebuild(self, df):
+        values = df[self.col]
+        self.rows = set(df.index[values.notna() & (values != "")])
+
+    def on_append(self, df, start):
+        for row_idx, value in zip(range(start, len(df)), df[self.col].iloc[start:]):
+            if self._filled(value):
+                self.rows.add(row_idx)
+
+    def on_update(self, df, row_idx, col_name):
+        if col_name == self.col:
+            if self._filled(df.at[row_idx, col_name]):
+                self.rows.add(row_idx)
+            else:
+                self.rows.discard(row_idx)
+
+class DailyActivity(SheetIndex):
+    """(date, role, activity_kind) -> rows still in recent_activity."""
+
+    def __init__(self):
+        self.counts = collections.Counter()
+
+    def rebuild(self, df):
+        self.counts = collections.Counter()
+        self.on_append(df, 0)
+
+    def on_append(self, df, start):
+        for ts, role, action in zip(df["timestamp"].iloc[start:], df["role"].iloc[start:], df["action"].iloc[start:]):
+            self.counts[(str(ts)[:10], str(role), activity_kind(action))] += 1
+
+@st.cache_resource
+def get_sheet_cache():
+    cache = SheetCache()
+    cache.add_index("users", "users_by_name", UserIndex())
+    for name, key_cols in KEY_COLUMNS.items():
+        cache.add_index(name, f"{name}_by_key", KeyIndex(key_cols))
+    cache.add_index("users", "users_sorted", SortedIndex("username"))
+    cache.add_index("recent_activity", "recent_activity_sorted", SortedIndex("timestamp"))
+    cache.add_index("users", "users_roles", RoleCounts())
+    cache.add_index("payments", "payments_stats", PaymentStats())
+    cache.add_index("requests", "requests_pending", PendingQueues())
+    cache.add_index("students", "students_with_books", NonEmptyRows("books_issued"))
+    cache.add_index("students", "students_with_room", NonEmptyRows("hostel_room"))
+    cache.add_index("recent_activity", "recent_activity_daily", DailyActivity())
+    return cache
+
+sheet_cache = get_sheet_cache()
+user_index = sheet_cache.index("users_by_name")
+
+# -----------------------
+# QUOTA-AWARE SHEETS CLIENT
+# -----------------------
+# Google Sheets allows 60 read and 60 write requests per minute per user
+SHEETS_READS_PER_MIN = 60
+SHEETS_WRITES_PER_MIN = 60
+API_MAX_RETRIES = 5
+READ_MAX_WAIT = 5  # seconds a page will wait for read quota before showing saved data
+STALE_RETRY_AFTER = 15  # seconds before a refused read is tried again
+
+# Objects whose methods act on one sheet, for labelling metrics
+WORKSHEET_TYPES = (gspread.Worksheet, SqliteWorksheet)
+
+class SheetsThrottled(Exception):
+    """No quota left for a call within the time the caller was willing to wait."""
+
+def is_retryable_error(err, idempotent=True):
+    """Quota errors are refused before anything runs, so they can always be retried.
+    A 5xx or network error may come after the call took effect, so those are only
+    retried when running it twice does no harm.
+    """
+    if isinstance(err, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return idempotent
+    status = getattr(getattr(err, "response", None), "status_code", None)
+    return status == 429 or (idempotent and status in (500, 502, 503))
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, max_wait=None):
+        """Take one token, sleeping for it if needed; False if that takes over max_wait."""
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+class SheetsClient:
+    """Every call to Google goes through here: rate limited, retried with backoff,
+    and identical reads that are already in flight share one request.
+    """
+
+    def __init__(self, reads_per_min, writes_per_min, metrics):
+        self.buckets = {"read": TokenBucket(reads_per_min), "write": TokenBucket(writes_per_min)}
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.metrics = metrics
+
+    def _timed(self, fn, args, kwargs):
+        # Calls on a worksheet are labelled with its name; spreadsheet-level calls
+        # (batched reads, opening or adding tabs) span several sheets and get "*"
+        op = getattr(fn, "__name__", "call")
+        owner = getattr(fn, "__self__", None)
+        sheet = owner.title if isinstance(owner, WORKSHEET_TYPES) else "*"
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.metrics.record_call(op, sheet, time.perf_counter() - start, error=True)
+            raise
+        # Reads are sized by what came back, writes by what was sent
+        body = result if op in ("values_batch_get", "get") else args
+        self.metrics.record_call(op, sheet, time.perf_counter() - start, payload_bytes(body))
+        return result
+
+    def call(self, kind, fn, *args, max_wait=None, idempotent=None, **kwargs):
+        """Run fn under the kind's quota; max_wait bounds the total time spent waiting.
+
+        Reads are idempotent; writes are only retried after server or network errors
+        when the caller says so (cell updates, not appends or deletes).
+        """
+        if idempotent is None:
+            idempotent = kind == "read"
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        for attempt in range(API_MAX_RETRIES):
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not self.buckets[kind].acquire(remaining):
+                raise SheetsThrottled(kind)
+            try:
+                return self._timed(fn, args, kwargs)
+            except (gspread.exceptions.APIError, requests.exceptions.RequestException) as e:
+                if not is_retryable_error(e, idempotent) or attempt == API_MAX_RETRIES - 1:
+                    raise
+                delay = min(2 ** attempt, 32) * random.uniform(0.5, 1.5)  # jitter spreads out retries
+                if deadline is not None and time.monotonic() + delay > deadline:
+                    raise
+                time.sleep(delay)
+
+    def read(self, key, fn, *args, max_wait=None, **kwargs):
+        """call("read", ...), but callers passing the same key at once share one request."""
+        with self.lock:
+            flight = self.inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.inflight[key] = {"done": threading.Event()}
+        if not leader:
+            flight["done"].wait()
+            if "error" in flight:
+                raise flight["error"]
+            return flight["result"]
+        try:
+            flight["result"] = self.call("read", fn, *args, max_wait=max_wait, **kwargs)
+            return flight["result"]
+        except Exception as e:
+            flight["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            flight["done"].set()
+
+@st.cache_resource
+def get_sheets_client(backend):
+    if backend == "sqlite":
+        # Local storage has no quota to protect
+        return SheetsClient(reads_per_min=10**9, writes_per_min=10**9, metrics=get_metrics())
+    return SheetsClient(SHEETS_READS_PER_MIN, SHEETS_WRITES_PER_MIN, get_metrics())
+
+sheets_client = get_sheets_client(STORAGE_BACKEND)
+sheet_mirror = None
+if STORAGE_BACKEND == "sqlite" and SQLITE_MIRROR_INTERVAL:
+    # The mirror writes to Google, so it spends the Sheet's quota, not local storage's
+    sheet_mirror = start_sheet_mirror(spreadsheet, get_sheets_client("sheets"), SHEET_ID, SQLITE_MIRROR_INTERVAL)
+
+# -----------------------
+# WRITE-BEHIND QUEUE
+# -----------------------
+WRITE_FLUSH_DELAY = 0.5  # seconds to let writes from the same click pile up
+APPEND_CHUNK_ROWS = 2000  # rows per append_rows call, well under Google's 10 MB request limit
+WRITE_MAX_ATTEMPTS = 5  # flushes a write may fail before it is given up on
+# Writes that could not be saved are kept here, one JSON object per line
+FAILED_WRITES_PATH = os.getenv("FAILED_WRITES_PATH", "failed_writes.jsonl")
+
+def write_outcome(err):
+    """'rejected' if a failed write surely changed nothing, 'unknown' if it may have
+    landed (5xx, dropped connection, timeout) and 'fatal' if resending cannot help.
+    """
+    if isinstance(err, SheetsThrottled):
+        return "rejected"
+    status = getattr(getattr(err, "response", None), "status_code", None)
+    if status == 429:
+        return "rejected"
+    if status is not None and 400 <= status < 500:
+        return "fatal"
+    return "unknown"
+
+def session_id():
+    """Id of the browser session running this thread, or None off the script thread."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else None
+
+class WriteQueue:
+    """Writes go into SheetCache straight away and reach Google from a background
+    thread, coalesced into one append_rows and one batch_update call per sheet.
+
+    Failed writes are resent on later flushes; those that still fail are written
+    to FAILED_WRITES_PATH and reported to the session that made them.
+    """
+
+    def __init__(self, cache, client):
+        self.cache = cache
+        self.client = client
+        self.cond = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.pending = []  # (sheet_name, ws, op, args, owner session, attempt)
+        self.inflight = set()
+        self.failed = collections.deque(maxlen=50)  # (sheet_name, error) for the admin
+        self.notices = collections.OrderedDict()  # session id -> messages not yet shown
+        threading.Thread(target=self._worker, name="sheet-write-behind", daemon=True).start()
+        atexit.register(self.flush)
+
+    def put(self, sheet_name, ws, op, args):
+        with self.cond:
+            self.pending.append((sheet_name, ws, op, args, session_id(), 0))
+            self.cond.notify()
+
+    def put_many(self, sheet_name, ws, rows):
+        owner = session_id()
+        with self.cond:
+            self.pending.extend((sheet_name, ws, "append", list(row), owner, 0) for row in rows)
+            self.cond.notify()
+
+    def take_notices(self, owner):
+        """Pop the messages about this session's writes that could not be saved."""
+        with self.cond:
+            return self.notices.pop(owner, [])
+
+    @contextmanager
+    def batch(self):
+        """Hold the worker back so every write queued inside goes out in one flush."""
+        with self.cond:
+            yield
+
+    def busy(self, sheet_name):
+        with self.cond:
+            return sheet_name in self.inflight or any(p[0] == sheet_name for p in self.pending)
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+            time.sleep(WRITE_FLUSH_DELAY)
+            try:
+                self.flush()
+            except Exception as e:  # keep the thread alive; the writes stay queued
+                self.failed.append(("*", repr(e)))
+                time.sleep(WRITE_FLUSH_DELAY)
+
+    def flush(self):
+        """Send everything queued so far and return once it is written or given up on."""
+        with self.flush_lock:
+            delay = 1
+            while self._send():
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                delay = min(delay * 2, 16)
+
+    def _send(self):
+        """One pass over the queue; True if some writes failed and were queued again."""
+        with self.cond:
+            batch, self.pending = self.pending, []
+            self.inflight = {p[0] for p in batch}
+        retry = []
+        try:
+            grouped = {}
+            for item in batch:
+                sheet_name, ws, op = item[:3]
+                ws, appends, updates = grouped.setdefault(sheet_name, (ws, [], {}))
+                if op == "append":
+                    appends.append(item)
+                else:
+                    row, col, _ = item[3]
+                    updates[(row, col)] = item  # the last write to a cell wins
+        except Exception:
+            retry = batch  # nothing was sent yet
+            raise
+        else:
+            # _send_sheet never raises, so one sheet's failure cannot lose another's writes
+            for sheet_name, (ws, appends, updates) in grouped.items():
+                retry += self._send_sheet(sheet_name, ws, appends, list(updates.values()))
+        finally:
+            with self.cond:
+                self.pending[:0] = retry
+                self.inflight = set()
+        return bool(retry)
+
+    def _send_sheet(self, sheet_name, ws, appends, updates):
+        """Write one sheet's appends, then its cell updates; returns the writes to try again."""
+        sent = 0
+        try:
+            # Rows already in the sheet (header included); an append lands below them
+            start = self._row_count(ws) if appends else 0
+            # Appends first, so updates to rows added in this batch find them
+            for sent in range(0, len(appends), APPEND_CHUNK_ROWS):
+                chunk = [item[3] for item in appends[sent:sent + APPEND_CHUNK_ROWS]]
+                try:
+                    self.client.call("write", ws.append_rows, chunk)
+                except Exception as e:
+                    # A chunk that may have landed is only resent if it is not in the sheet
+                    if write_outcome(e) != "unknown" or not self._appended(ws, chunk, start + sent):
+                        raise
+            sent = len(appends)
+            if updates:
+                data = [{"range": rowcol_to_a1(row, col), "values": [[value]]}
+                        for row, col, value in (item[3] for item in updates)]
+                self.client.call("write", ws.batch_update, data, idempotent=True,
+                                 value_input_option=ValueInputOption.user_entered)
+            return []
+        except Exception as e:
+            fatal = write_outcome(e) == "fatal"
+            again, dead = [], []
+            for item in appends[sent:] + updates:
+                item = (*item[:5], item[5] + 1)
+                (dead if fatal or item[5] >= WRITE_MAX_ATTEMPTS else again).append(item)
+            if dead:
+                self._give_up(sheet_name, dead, e)
+            return again
+
+    def _row_count(self, ws):
+        """Rows in the sheet, header included, going by its first column.
+
+        Every sheet's first column is filled in on every row the app writes.
+        """
+        return len(self.client.call("read", ws.get, "A1:A"))
+
+    def _appended(self, ws, rows, start):
+        """True if rows sit next to each other, in this order, at or below row index start.
+
+        Rows above start were there before the append, so an identical row among them
+        (the same activity logged twice in one second, say) does not count.
+        """
+        def trimmed(row):
+            row = [str(v) for v in row]
+            while row and row[-1] == "":
+                row.pop()
+            return row
+        try:
+            values = [trimmed(r) for r in self.client.call("read", ws.get)]
+        except Exception:
+            return False
+        rows = [trimmed(r) for r in rows]
+        # Search from the bottom, where an append that landed would be
+        for end in range(len(values), start + len(rows) - 1, -1):
+            if values[end - len(rows):end] == rows:
+                return True
+        return False
+
+    def _give_up(self, sheet_name, items, err):
+        """Keep unsaved writes on disk, reload the sheet and tell whoever made them."""
+        self.failed.append((sheet_name, str(err)))
+        self.cache.invalidate(sheet_name)
+        try:
+            with open(FAILED_WRITES_PATH, "a", encoding="utf-8") as f:
+                for item in items:
+                    f.write(json.dumps({"sheet": sheet_name, "op": item[2], "args": list(item[3]),
+                                        "error": str(err), "at": datetime.now().isoformat(timespec="seconds")},
+                                       default=str) + "\n")
+            kept = f", kept in {FAILED_WRITES_PATH}"
+        except OSError:
+            kept = ""
+        owners = collections.Counter(item[4] for item in items)
+        with self.cond:
+            for owner, n in owners.items():
+                if owner is None:
+                    continue
+                self.notices.setdefault(owner, []).append(
+                    f"{n} change(s) to {sheet_name} could not be saved to Google Sheets{kept}: {err}")
+                self.notices.move_to_end(owner)
+            while len(self.notices) > 500:  # sessions that never came back
+                self.notices.popitem(last=False)
+
+@st.cache_resource
+def get_write_queue():
+    return WriteQueue(get_sheet_cache(), get_sheets_client(STORAGE_BACKEND))
+
+write_queue = get_write_queue()
+
+# -----------------------
+# UTILITIES
+# -----------------------
+def sheet_range(sheet_name, first_row=1):
+    last_col = gspread.utils.rowcol_to_a1(1, len(sheets_info[sheet_name])).rstrip("0123456789")
+    return f"'{sheet_name}'!A{first_row}:{last_col}"
+
+# Columns kept as the text in the sheet; numericising would turn password "0123"
+# into 123 and username "007" into 7 once the sheet is read again
+TEXT_COLUMNS = {"username", "password", "email", "phone"}
+
+def frame_from_values(sheet_name, rows):
+    """Build a DataFrame like get_all_records would from a raw value grid (no header),
+    except that TEXT_COLUMNS stay text."""
+    header = sheets_info[sheet_name]
+    text = [i for i, col in enumerate(header) if col in TEXT_COLUMNS]
+    frame_rows = []
+    for r in rows:
+        r = rightpad(list(r), len(header))[:len(header)]
+        values = numericise_all(r)
+        for i in text:
+            values[i] = r[i]
+        frame_rows.append(values)
+    return pd.DataFrame(frame_rows, columns=header)
+
+def read_failure(err):
+    """Why a read failed, in words for the stale-data banner."""
+    status = getattr(getattr(err, "response", None), "status_code", None)
+    if isinstance(err, SheetsThrottled) or status == 429:
+        return "rate limited"
+    if status is not None:
+        return f"error {status} from Google Sheets"
+    return "could not reach Google Sheets"
+
+def safe_batch_get(ranges):
+    """Read several ranges in one values_batch_get round trip, one value grid per range.
+
+    Returns (grids, None), or (None, reason) when the read failed, so callers can keep
+    their old data and say why.
+    """
+    try:
+        resp = sheets_client.read(tuple(ranges), spreadsheet.values_batch_get, list(ranges), max_wait=READ_MAX_WAIT)
+    except (gspread.exceptions.APIError, SheetsThrottled, requests.exceptions.RequestException) as e:
+        return None, read_failure(e)
+    return [value_range.get("values", []) for value_range in resp.get("valueRanges", [])], None
+
+def same_row(a, b):
+    return [str(v) for v in a] == [str(v) for v in b]
+
+def column_range(sheet_name, col_name, last_row):
+    letter = rowcol_to_a1(1, sheets_info[sheet_name].index(col_name) + 1).rstrip("0123456789")
+    return f"'{sheet_name}'!{letter}2:{letter}{last_row}"
+
+def same_column(values, cached):
+    """True if a column read from the sheet holds what the cache has, compared the way it is cached."""
+    values = [r[0] if r else "" for r in values]
+    values += [""] * (len(cached) - len(values))
+    return [str(v) for v in numericise_all(values)] == [str(v) for v in cached]
+
+def load_sheets(sheet_names, full=False, check=None):
+    """Read sheets into the cache in one values_batch_get round trip.
+
+    check maps a sheet to one of its columns; when the sheet is read from its tail,
+    that column is read in full in the same round trip, and a sheet whose column
+    no longer matches the cache (a row edited in the Sheet) is read again in full.
+    """
+    sheet_names = list(sheet_names)
+    if not sheet_names:
+        return
+    # Append-only sheets are read from their last cached row onwards (row 1 is the
+    # header, so data row i sits on sheet row i + 2); the first row read back must
+    # match what we already have, otherwise rows were deleted or edited.
+    first_rows = {name: 1 if full or not sheet_cache.can_read_tail(name) else len(sheet_cache.get(name)) + 1
+                  for name in sheet_names}
+    checked = [name for name in sheet_names if first_rows[name] > 1 and name in (check or {})]
+    seen = {name: sheet_cache.versions.get(name, 0) for name in sheet_names}
+    grids, failure = safe_batch_get([sheet_range(name, first_rows[name]) for name in sheet_names]
+                                    + [column_range(name, check[name], first_rows[name]) for name in checked])
+    if grids is None:
+        for name in sheet_names:
+            sheet_cache.mark_stale(name, STALE_RETRY_AFTER, failure)
+        return
+    columns = dict(zip(checked, grids[len(sheet_names):]))
+    resync = []
+    for name, values in zip(sheet_names, grids):
+        if first_rows[name] == 1:
+            sheet_cache.put(name, frame_from_values(name, values[1:]), seen_version=seen[name])
+            continue
+        df = sheet_cache.get(name)
+        tail = frame_from_values(name, values)
+        anchor = df.iloc[-1].tolist() if len(df) else sheets_info[name]
+        if tail.empty or not same_row(tail.iloc[0].tolist(), anchor):
+            resync.append(name)
+        elif name in columns and not same_column(columns[name], df[check[name]]):
+            resync.append(name)
+        else:
+            sheet_cache.extend(name, tail.iloc[1:], seen_version=seen[name])
+    if resync:
+        load_sheets(resync, full=True)
+
+def needs_load(sheet_name):
+    if sheet_cache.get(sheet_name) is None:
+        return True
+    # A read taken before queued writes reach Google would drop them from the cache
+    return not sheet_cache.is_fresh(sheet_name) and not write_queue.busy(sheet_name)
+
+def lookup_needs_load(sheet_name):
+    stale = needs_load(sheet_name)
+    metrics.cache_lookup(sheet_name, hit=not stale)
+    return stale
+
+def load_all_once():
+    load_sheets(name for name in sheets_info.keys() if lookup_needs_load(name))
+
+def cached_df(sheet_name):
+    if lookup_needs_load(sheet_name):
+        refresh_single(sheet_name)
+    return sheet_cache.get(sheet_name)
+
+# Helper functions
+def append_row(sheet_name, row):
+    sheet_cache.append(sheet_name, row)
+    metrics.queued_write(sheet_name)
+    write_queue.put(sheet_name, ws_by_name(sheet_name), "append", list(row))
+
+def refresh_single(sheet_name):
+    load_sheets([sheet_name])
+
+def update_cell(sheet_name, row_idx, col_name, value):
+    """Queue one cell write; False if there is no row to write to."""
+    if row_idx is None:  # key not found, e.g. the row was deleted meanwhile
+        return False
+    col_idx = sheets_info[sheet_name].index(col_name) + 1
+    sheet_cache.set_value(sheet_name, row_idx, col_name, value)
+    metrics.queued_write(sheet_name)
+    write_queue.put(sheet_name, ws_by_name(sheet_name), "update", (row_idx + 2, col_idx, value))  # +2 for header
+    return True
+
+def delete_user(username):
+    """Delete a user's row; returns "deleted", "missing" or "moved".
+
+    "moved" means the row kept changing under us, so nothing was deleted. Sheets
+    errors are raised once the cached users sheet is marked for a reload.
+    """
+    # Queued writes address rows by position, so send them before rows shift
+    write_queue.flush()
+    ws = ws_by_name("users")
+    try:
+        for _ in range(2):
+            row_idx = find_row_index_by_key("users", username)
+            if row_idx is None:
+                return "missing"
+            # delete_rows is not retried, so first make sure the row is still this user's
+            if sheets_client.call("read", ws.row_values, row_idx + 2, max_wait=READ_MAX_WAIT)[:1] == [str(username)]:
+                break
+            sheet_cache.invalidate("users")  # the sheet changed elsewhere; find the row again
+        else:
+            return "moved"
+        sheets_client.call("write", ws.delete_rows, row_idx + 2)
+    except (gspread.exceptions.APIError, SheetsThrottled, requests.exceptions.RequestException):
+        sheet_cache.invalidate("users")  # a delete that failed on the way back may have gone through
+        raise
+    sheet_cache.drop_row("users", row_idx)
+    return "deleted"
+
+def find_row_index_by_key(sheet_name, *key_vals):
+    """row_idx of the row whose KEY_COLUMNS equal key_vals, or None."""
+    cached_df(sheet_name)
+    return sheet_cache.index(f"{sheet_name}_by_key").lookup(*key_vals)
+
+def log_activity_local(user, role, action):
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    append_row("recent_activity", [user, role, action, ts])
+
+# -----------------------
+# ACTIVITY RETENTION
+# -----------------------
+# Rows that leave recent_activity's hot window (ACTIVITY_HOT_DAYS / ACTIVITY_HOT_ROWS)
+# are copied to one archive tab per month, deleted and then counted into activity_daily,
+# so the sheet every page reads stays the same size however old the app gets.
+ACTIVITY_COMPACT_EVERY = 3600  # seconds
+
+def archive_title(timestamp):
+    month = str(timestamp)[:7]
+    if re.fullmatch(r"\d{4}-\d{2}", month):
+        return "recent_activity_" + month.replace("-", "_")
+    return "recent_activity_undated"
+
+def archive_worksheet(title):
+    try:
+        return sheets_client.call("read", spreadsheet.worksheet, title)
+    except gspread.WorksheetNotFound:
+        header = sheets_info["recent_activity"]
+        ws = sheets_client.call("write", spreadsheet.add_worksheet, title=title, rows=500, cols=len(header))
+        sheets_client.call("write", ws.insert_row, header, index=1)
+        return ws
+
+def sheet_text(ws, width, a1=None):
+    """Rows of a worksheet (header included) as the text stored in it, each padded to width cells."""
+    values = sheets_client.call("read", ws.get, a1, max_wait=READ_MAX_WAIT)
+    return [[str(v) for v in rightpad(list(r), width)[:width]] for r in values]
+
+def daily_key(row):
+    """(date, role, kind of action) of a recent_activity row given as text."""
+    username, role, action, timestamp = row
+    return timestamp[:10], role, activity_kind(action)
+
+def archive_rows(title, rows):
+    """Append rows to an archive tab, skipping those a run that failed part-way already
+    added; returns every row the tab then holds."""
+    ws = archive_worksheet(title)
+    have = sheet_text(ws, len(sheets_info["recent_activity"]))[1:]
+    left = collections.Counter(map(tuple, have))
+    new = []
+    for row in rows:
+        if left[tuple(row)]:
+            left[tuple(row)] -= 1
+        else:
+            new.append(row)
+    for start in range(0, len(new), APPEND_CHUNK_ROWS):
+        sheets_client.call("write", ws.append_rows, new[start:start + APPEND_CHUNK_ROWS])
+    return have + new
+
+def write_daily_counts(counts):
+    """Set activity_daily's count for each (date, role, action) key, adding rows for new keys.
+
+    Counts are set rather than added to, so writing the same counts twice changes nothing.
+    """
+    ws = ws_by_name("activity_daily")
+    header = sheets_info["activity_daily"]
+    count_col = header.index("count") + 1
+    found, data = set(), []
+    for sheet_row, row in enumerate(sheet_text(ws, len(header))[1:], start=2):
+        key = tuple(row[:3])
+        if key not in counts:
+            continue
+        # An append that failed on its way back may have left a second row for a key
+        value = 0 if key in found else counts[key]
+        found.add(key)
+        if row[count_col - 1] != str(value):
+            data.append({"range": rowcol_to_a1(sheet_row, count_col), "values": [[value]]})
+    new = [[*key, n] for key, n in counts.items() if key not in found]
+    if data:
+        sheets_client.call("write", ws.batch_update, data, idempotent=True)
+    if new:
+        sheets_client.call("write", ws.append_rows, new)
+    if data or new:
+        sheet_cache.invalidate("activity_daily")  # counts changed in place, so read it in full
+
+@st.cache_resource
+def get_compaction_lock():
+    return threading.Lock()
+
+@st.cache_resource
+def get_uncounted_archives():
+    """Archive tabs whose rows left recent_activity but whose counts could not be written yet."""
+    return set()
+
+def count_archives(tabs):
+    """Set activity_daily's counts from every row of the given archive tabs (title -> rows),
+    plus any tabs a failed run left uncounted.
+
+    Only called once the rows are gone from recent_activity, so each row is counted
+    either there or here, never in both.
+    """
+    uncounted = get_uncounted_archives()
+    width = len(sheets_info["recent_activity"])
+    for title in uncounted - tabs.keys():
+        tabs[title] = sheet_text(archive_worksheet(title), width)[1:]
+    uncounted.update(tabs)
+    counts = collections.Counter()
+    for rows in tabs.values():
+        counts.update(daily_key(row) for row in rows)
+    write_daily_counts(counts)
+    uncounted.clear()
+
+def compact_activity(now=None):
+    """Archive the rows that fell out of the hot window; returns how many moved.
+
+    Runs one at a time per process. Every step before the delete can be repeated after
+    a failure, and the delete only goes ahead if the top rows are still the ones archived.
+    Counts are written after the delete, so a row is never in both recent_activity and
+    activity_daily.
+    """
+    with get_compaction_lock():
+        write_queue.flush()  # row positions below must include every queued append
+        ws = ws_by_name("recent_activity")
+        header = sheets_info["recent_activity"]
+        ts_col = header.index("timestamp")
+        seen = sheet_cache.versions.get("recent_activity", 0)
+        # The sheet's own text, so that archived rows keep it ("007" rather than 7)
+        values = sheet_text(ws, len(header))[1:]
+        cutoff = ((now or datetime.now()) - timedelta(days=ACTIVITY_HOT_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+        # Rows are appended as things happen, so the ones to move form a run at the top
+        moved = next((i for i, row in enumerate(values) if row[ts_col] >= cutoff), len(values))
+        moved = max(moved, len(values) - ACTIVITY_HOT_ROWS)
+        if moved <= 0:
+            if get_uncounted_archives():
+                count_archives({})
+            return 0
+        archived = values[:moved]
+        by_title = {}
+        for row in archived:
+            by_title.setdefault(archive_title(row[ts_col]), []).append(row)
+        tabs = {title: archive_rows(title, rows) for title, rows in by_title.items()}
+        # Another process may have compacted since we read; delete only what was archived here
+        if sheet_text(ws, len(header), f"A2:{rowcol_to_a1(moved + 1, len(header))}") != archived:
+            sheet_cache.invalidate("recent_activity")
+            return 0
+        sheets_client.call("write", ws.delete_rows, 2, moved + 1)
+        with sheet_cache.lock:
+            if sheet_cache.versions.get("recent_activity", 0) == seen:
+                sheet_cache.put("recent_activity", frame_from_values("recent_activity", values[moved:]))
+            else:
+                sheet_cache.invalidate("recent_activity")  # appended to meanwhile, read it again
+        count_archives(tabs)
+        return moved
+
+@st.cache_resource
+def start_activity_compactor(sheet_id, backend):
+    """Run compact_activity every ACTIVITY_COMPACT_EVERY seconds in this process.
+
+    Returns the compactor's status: failures in a row and the last error, if any.
+    """
+    status = {"failures": 0, "last_error": None}
+
+    def compact_forever():
+        while True:
+            time.sleep(ACTIVITY_COMPACT_EVERY)
+            try:
+                compact_activity()
+            except Exception as e:  # keep the thread alive; the rows stay in recent_activity for the next round
+                status["failures"] += 1
+                status["last_error"] = f"{type(e).__name__}: {e}"
+            else:
+                status["failures"], status["last_error"] = 0, None
+
+    threading.Thread(target=compact_forever, name="activity-compactor", daemon=True).start()
+    return status
+
+activity_compactor = start_activity_compactor(SHEET_ID, STORAGE_BACKEND)
+
+def daily_activity():
+    """Rows per day, role and kind of action: activity_daily plus what is still in recent_activity."""
+    for name in ("recent_activity", "activity_daily"):
+        cached_df(name)
+
+    def build():
+        _, counts = sheet_cache.view("recent_activity_daily", lambda ix: list(ix.counts.items()))
+        hot = pd.DataFrame([(*key, n) for key, n in counts], columns=sheets_info["activity_daily"])
+        both = pd.concat([sheet_cache.get("activity_daily"), hot], ignore_index=True).astype({"date": str, "role": str, "action": str})
+        both["count"] = pd.to_numeric(both["count"], errors="coerce").fillna(0).astype(int)
+        daily = both.groupby(["date", "role", "action"], as_index=False)["count"].sum()
+        return daily.sort_values(["date", "count"], ascending=[False, False], ignore_index=True)
+
+    return sheet_cache.memoize("daily_activity", ["recent_activity", "activity_daily"], build)
+
+# -----------------------
+# LIVE UPDATES
+# -----------------------
+# One probe per process keeps the sheets behind the request queues and the admin
+# overview current with a single values_batch_get every LIVE_POLL_SECONDS. For these
+# append-only sheets it returns the rows added since the last poll plus their status
+# column, so a request or payment decided elsewhere shows up within one poll too.
+# Each session records the sheet versions it drew; a small fragment compares them
+# every LIVE_POLL_SECONDS and reruns the page only when they changed.
+LIVE_POLL_SECONDS = 10
+LIVE_SHEETS = ("requests", "payments")
+LIVE_CHECK_COLUMNS = {"requests": "status", "payments": "status"}
+LIVE_MAX_BACKOFF = 300  # seconds between polls at most while they keep failing
+
+class ChangeProbe:
+    """Polls LIVE_SHEETS in the background while any session has a live panel open."""
+
+    def __init__(self, sheet_names, interval):
+        self.sheet_names = sheet_names
+        self.interval = interval
+        self.wanted_until = 0.0
+        self.polls = 0
+        self.failures = 0  # polls failed in a row
+        self.last_error = None
+        threading.Thread(target=self._run, name="change-probe", daemon=True).start()
+
+    def touch(self):
+        """Called by live panels; the probe stops a few polls after the last one closes."""
+        self.wanted_until = time.monotonic() + 3 * self.interval
+
+    def _run(self):
+        delay = self.interval
+        while True:
+            time.sleep(delay)
+            if time.monotonic() > self.wanted_until:
+                continue
+            try:
+                # A read taken before queued writes reach Google would drop them from the cache
+                load_sheets((name for name in self.sheet_names if not write_queue.busy(name)),
+                            check=LIVE_CHECK_COLUMNS)
+                with sheet_cache.lock:
+                    refused = sorted(name for name in self.sheet_names if name in sheet_cache.stale)
+                if refused:  # load_sheets kept the old frames; back off all the same
+                    raise SheetsThrottled(f"Google Sheets refused to read {', '.join(refused)}")
+            except Exception as e:  # one bad poll must not end live updates for good
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                delay = min(self.interval * 2 ** self.failures, LIVE_MAX_BACKOFF)
+            else:
+                self.polls += 1
+                self.failures, self.last_error = 0, None
+                delay = self.interval
+
+    def warn(self):
+        """Tell the viewer when what they see may be behind the sheet."""
+        if self.last_error:
+            st.warning(f"Live updates keep failing ({self.last_error}); "
+                       "showing the last data read and retrying.")
+
+@st.cache_resource
+def get_change_probe(sheet_id, backend):
+    return ChangeProbe(LIVE_SHEETS, LIVE_POLL_SECONDS)
+
+change_probe = get_change_probe(SHEET_ID, STORAGE_BACKEND)
+
+def live_stamp(sheet_names):
+    with sheet_cache.lock:
+        return tuple(sheet_cache.versions.get(name, 0) for name in sheet_names)
+
+@st.fragment(run_every=LIVE_POLL_SECONDS)
+def live_watch(key, sheet_names):
+    """Rerun the page once a sheet drawn under key has changed; draws nothing otherwise."""
+    change_probe.touch()
+    change_probe.warn()
+    if live_stamp(sheet_names) != st.session_state.get(f"{key}_stamp"):
+        st.rerun()
+
+def watch_live(key, sheet_names):
+    """Record the versions of the sheets a panel is about to draw and watch them for changes.
+
+    Call after loading the sheets and before reading them, so no change goes unseen.
+    """
+    st.session_state[f"{key}_stamp"] = live_stamp(sheet_names)
+    live_watch(key, tuple(sheet_names))
+
+# -----------------------
+# DEMO USERS
+# -----------------------
+def ensure_demo_data():
+    cached_df("users")  # loads the sheet behind user_index
+    if "users" in sheet_cache.stale:
+        # We couldn't read the users sheet, so we can't tell which accounts exist
+        return
+    demo_users = [
+        ["admin","pass123","Admin","admin@example.com","999000501"],
+        ["student1","pass123","Student","student1@example.com","999000111"],
+        ["student2","pass123","Student","student2@example.com","999000112"],
+        ["librarian","pass123","Librarian","lib@example.com","999000301"],
+        ["warden","pass123","Hostel Warden","warden@example.com","999000401"],
+    ]
+    for u in demo_users:
+        if norm_username(u[0]) not in user_index.by_name:
+            append_row("users", u)
+
+load_all_once()
+ensure_demo_data()
+
+# -----------------------
+# AUTHENTICATION FUNCTIONS
+# -----------------------
+def authenticate(username, password):
+    cached_df("users")  # loads the sheet behind user_index
+    entry = user_index.by_name.get(norm_username(username))
+    if entry and entry[1] == password.strip():
+        canon_user, _, role = entry
+        return role, canon_user
+    return None, None
+
+def create_account(username, password, role, email, phone):
+    """Queue a new users row; ValueError if the name is taken or cannot be checked."""
+    cached_df("users")  # loads the sheet behind user_index
+    if "users" in sheet_cache.stale:
+        # An old users frame may be missing the account this would duplicate
+        raise ValueError("Could not read the users sheet from Google Sheets; try again shortly.")
+    if norm_username(username) in user_index.by_name:
+        raise ValueError("Username already exists.")
+    append_row("users", [username.strip(), password.strip(), role, email.strip(), phone.strip()])
+
+def reset_login():
+    st.session_state.logged_in = False
+    st.session_state.user = None
+    st.session_state.role = None
+
+# -----------------------
+# PAGINATED TABLES
+# -----------------------
+PAGE_SIZES = [25, 50, 100]
+
+def filter_mask(df, filters):
+    """filters: (column, op, value) with op one of "contains", "eq", "ge", "le"."""
+    mask = np.ones(len(df), dtype=bool)
+    for col, op, val in filters:
+        values = df[col].astype(str)
+        if op == "contains":
+            mask &= values.str.contains(val, case=False, regex=False).to_numpy()
+        elif op == "eq":
+            mask &= (values.str.strip().str.lower() == val.lower()).to_numpy()
+        elif op == "ge":
+            mask &= (values >= val).to_numpy()
+        elif op == "le":
+            mask &= (values <= val).to_numpy()
+    return mask
+
+def query_page(sheet_name, index_name, filters, page, page_size, descending=False):
+    """One page of rows, ordered by the sheet's SortedIndex; returns (page_df, total)."""
+    cached_df(sheet_name)
+    # A rebuild replaces order and filtered, so the pair taken here stays consistent with df
+    df, (order, filtered) = sheet_cache.view(index_name, lambda ix: (ix.order, ix.filtered))
+    key = tuple(filters)
+    positions = filtered.get(key)
+    if positions is None:
+        positions = order[filter_mask(df, filters)[order]] if filters else order
+        if len(filtered) > 32:
+            filtered.clear()
+        filtered[key] = positions
+    total = len(positions)
+    if descending:
+        window = positions[::-1][page * page_size:(page + 1) * page_size]
+    else:
+        window = positions[page * page_size:(page + 1) * page_size]
+    page_df = df.iloc[window]
+    return page_df.where(page_df.notna(), ""), total
+
+def paged_table(sheet_name, index_name, filters, key, descending=False):
+    c1, c2 = st.columns([1, 3])
+    page_size = c1.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_size")
+    page_key = f"{key}_page"
+    page = st.session_state.get(page_key, 1)
+    page_df, total = query_page(sheet_name, index_name, filters, page - 1, page_size, descending)
+    pages = max(1, math.ceil(total / page_size))
+    if page > pages:
+        # Filters shrank the result; jump to its last page
+        page = st.session_state[page_key] = pages
+        page_df, total = query_page(sheet_name, index_name, filters, page - 1, page_size, descending)
+    st.dataframe(page_df, hide_index=True)
+    c2.number_input(f"Page (of {pages}, {total} rows)", min_value=1, max_value=pages, key=page_key)
+
+# -----------------------
+# ADMIN AGGREGATES
+# -----------------------
+def student_details():
+    """username -> (name, department), rebuilt when the students sheet changes."""
+    def build():
+        students = sheet_cache.get("students")
+        return dict(zip(students["username"], zip(students["name"], students["department"])))
+    return sheet_cache.memoize("student_details", ["students"], build)
+
+def build_overview():
+    payments, (pending_rows, by_user, by_fee, total) = sheet_cache.view(
+        "payments_stats", lambda s: (sorted(s.pending), list(s.by_user.items()), s.by_fee.most_common(), s.total))
+    details = student_details()
+
+    # Only the pending rows are looked at, so this scales with the backlog, not the table
+    pending = payments.loc[pending_rows, ["username","fee_type","amount","date","status"]]
+    names, departments = zip(*[details.get(u, ("", "")) for u in pending["username"]]) if len(pending) else ((), ())
+    pending_df = pd.DataFrame({
+        "name": names,
+        "department": departments,
+        "fee_type": pending["fee_type"].to_numpy(),
+        "amount": pending["amount"].to_numpy(),
+        "date": pending["date"].to_numpy(),
+        "status": pending["status"].to_numpy(),
+    })
+    by_department = collections.Counter()
+    for username, count in by_user:
+        by_department[details.get(username, ("", ""))[1] or "Unknown"] += count
+    return {
+        "total_students": sheet_cache.index("users_roles").counts.get("student", 0),
+        "total_payments": total,
+        "pending_count": len(pending_rows),
+        "pending_df": pending_df,
+        "by_department": pd.DataFrame(by_department.most_common(), columns=["department","pending"]),
+        "by_fee_type": pd.DataFrame(by_fee, columns=["fee_type","pending"]),
+    }
+
+OVERVIEW_SHEETS = ("users", "payments", "students")
+
+def overview_aggregates():
+    return sheet_cache.memoize("overview", OVERVIEW_SHEETS, build_overview)
+
+def overview_panel():
+    with metrics.section("admin.overview"):
+        st.subheader("Overview")
+
+        for name in OVERVIEW_SHEETS:
+            cached_df(name)
+        watch_live("overview", OVERVIEW_SHEETS)
+        agg = overview_aggregates()
+        st.metric("Total Students", agg["total_students"])
+        st.metric("Total Payments", agg["total_payments"])
+        st.metric("Pending Payments", agg["pending_count"])
+
+        # --- Students with pending payments
+        if agg["pending_count"]:
+            if not cached_df("students").empty:
+                st.markdown("### Students with Pending Payments")
+                st.dataframe(agg["pending_df"], hide_index=True)
+                c1, c2 = st.columns(2)
+                c1.markdown("#### Pending by Department")
+                c1.dataframe(agg["by_department"], hide_index=True)
+                c2.markdown("#### Pending by Fee Type")
+                c2.dataframe(agg["by_fee_type"], hide_index=True)
+            else:
+                st.info("Student details not available.")
+        else:
+            st.info("No pending payments.")
+
+# -----------------------
+# REQUEST QUEUES
+# -----------------------
+def assign_request(r):
+    """Record what an approved request gives the student on their students row."""
+    sidx = find_row_index_by_key("students", r["username"])
+    if sidx is None:
+        return
+    details = str(r["details"])
+    if r["request_type"] == "Library":
+        cur = cached_df("students").at[sidx,"books_issued"]
+        new_val = (str(cur)+","+details).strip(",") if cur else details
+        update_cell("students",sidx,"books_issued",new_val)
+    elif r["request_type"] == "Hostel":
+        assigned = details if any(ch.isdigit() for ch in details) else "Assigned-"+datetime.now().strftime("%Y%m%d%H%M%S")
+        update_cell("students",sidx,"hostel_room",assigned)
+
+def decide_requests(ids, approve, user, role):
+    """Approve or reject requests given by their KEY_COLUMNS values; all their writes are sent as one batch.
+
+    Returns how many were decided; requests that are gone or no longer pending are skipped.
+    """
+    status = "Approved" if approve else "Rejected"
+    # Load outside the batch so no sheet read happens while the queue is held
+    cached_df("requests")
+    cached_df("students")
+    reqs, rows = sheet_cache.view("requests_by_key", lambda ix: [ix.rows.get(KeyIndex._key(k)) for k in ids])
+    decided = 0
+    with write_queue.batch():
+        for row_idx in rows:
+            if row_idx is None or reqs.at[row_idx, "status"] != "Pending":
+                continue  # deleted, or decided by someone else since it was shown
+            r = reqs.loc[row_idx]
+            if not update_cell("requests",row_idx,"status",status):
+                continue
+            if approve:
+                assign_request(r)
+            log_activity_local(user,role,f"{status} {str(r['request_type']).lower()} request {r['username']}")
+            decided += 1
+    return decided
+
+# Queue callbacks get the ids of the rows on screen when the user clicked, so rows
+# that arrive with a live refresh are never picked or decided without being seen.
+def new_queue_editor(key):
+    st.session_state[f"{key}_editor"] = st.session_state.get(f"{key}_editor", 0) + 1
+
+def pick_requests(key, editor_key, shown):
+    picked = st.session_state.setdefault(f"{key}_picked", set())
+    for pos, change in st.session_state[editor_key]["edited_rows"].items():
+        if "select" in change:
+            (picked.add if change["select"] else picked.discard)(shown[int(pos)])
+    new_queue_editor(key)  # edits are held by row position, which a refresh may shift
+
+def pick_all_requests(key, shown):
+    st.session_state[f"{key}_picked"] = set(shown)
+    new_queue_editor(key)
+
+def decide_picked(key, request_type, ids, approve, label, user, role):
+    decided = decide_requests(ids, approve, user, role)
+    st.session_state[f"{key}_done"] = f"{label}d {decided} {request_type.lower()} request(s)."
+    st.session_state[f"{key}_picked"] = set()
+    new_queue_editor(key)
+
+def pending_request_queue(request_type, key, user, role):
+    """Selectable table of pending requests of one type with bulk Approve/Reject.
+
+    Redrawn when the requests sheet changes, from the cache the change probe keeps current.
+    Ticks are kept as request ids, so they stay on the right rows when the table changes.
+    """
+    done = st.session_state.pop(f"{key}_done", None)
+    if done:
+        st.success(done)
+    cached_df("requests")
+    watch_live(key, ("requests",))
+    reqs, rows = sheet_cache.view("requests_pending", lambda ix: ix.rows(request_type))
+    pending = reqs.loc[rows]
+    seen = st.session_state.get(f"{key}_seen")
+    if seen is not None and len(pending) > seen:
+        st.toast(f"{len(pending) - seen} new {request_type.lower()} request(s)")
+    st.session_state[f"{key}_seen"] = len(pending)
+    if pending.empty:
+        st.info(f"No pending {request_type.lower()} requests")
+        return
+    shown = [KeyIndex._key(k) for k in zip(*(pending[c] for c in KEY_COLUMNS["requests"]))]
+    # Ticks on requests that were decided elsewhere or deleted go away with them
+    picked = st.session_state[f"{key}_picked"] = st.session_state.get(f"{key}_picked", set()) & set(shown)
+    selected = [k for k in shown if k in picked]
+    c1, c2 = st.columns(2)
+    c1.button("Select all", key=f"{key}_all", on_click=pick_all_requests, args=(key, shown))
+    c2.button("Clear", key=f"{key}_none", on_click=pick_all_requests, args=(key, []), disabled=not selected)
+    table = pending[["username","details","timestamp"]].astype(str)
+    table.insert(0, "select", [k in picked for k in shown])
+    editor_key = f"{key}_pick_{st.session_state.get(f'{key}_editor', 0)}"
+    st.data_editor(table, key=editor_key, hide_index=True, on_change=pick_requests, args=(key, editor_key, shown),
+                   disabled=["username","details","timestamp"],
+                   column_config={"select": st.column_config.CheckboxColumn("Select")})
+    c1, c2 = st.columns(2)
+    for col, approve, label in ((c1, True, "Approve"), (c2, False, "Reject")):
+        col.button(f"{label} selected ({len(selected)})", key=f"{key}_{label.lower()}", disabled=not selected,
+                   on_click=decide_picked, args=(key, request_type, selected, approve, label, user, role))
+
+# -----------------------
+# BULK IMPORT / EXPORT
+# -----------------------
+IMPORT_SHEETS = ("students", "payments", "requests")
+IMPORT_CHUNK_ROWS = 2000  # rows read, checked and queued at a time
+# Columns an imported row must fill in; numeric ones must parse as numbers
+IMPORT_RULES = {
+    "students": {"required": ["username", "name"]},
+    "payments": {"required": ["username", "fee_type", "amount"], "numeric": ["amount"]},
+    "requests": {"required": ["username", "request_type", "status"]},
+}
+EXPORT_CHUNK_ROWS = 5000
+
+def read_upload_chunks(upload, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Yield the rows of an uploaded CSV or XLSX file as string DataFrames of chunk_rows rows."""
+    if upload.name.lower().endswith(".xlsx"):
+        wb = openpyxl.load_workbook(upload, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = [str(c).strip() if c is not None else "" for c in next(rows, ())]
+            chunk = []
+            for row in rows:
+                if any(c is not None for c in row):
+                    chunk.append(["" if c is None else str(c) for c in row])
+                if len(chunk) == chunk_rows:
+                    yield pd.DataFrame(chunk, columns=header)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=header)
+        finally:
+            wb.close()
+    else:
+        for chunk in pd.read_csv(upload, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+            chunk.columns = [str(c).strip() for c in chunk.columns]
+            yield chunk
+
+def check_import_chunk(sheet_name, chunk, first_line):
+    """Split a chunk into the rows to add and a list of (file line, reason) rejects.
+
+    The rows come back twice: as the file's stripped text, which is what gets written,
+    and as the cache holds them, built by frame_from_values as the next read would return them.
+    """
+    rules = IMPORT_RULES[sheet_name]
+    header = sheets_info[sheet_name]
+    chunk = chunk[header].apply(lambda col: col.str.strip()).reset_index(drop=True)
+    lines = pd.Series(range(first_line, first_line + len(chunk)))
+    reason = pd.Series("", index=chunk.index)
+    for col in rules["required"]:
+        reason = reason.mask((reason == "") & (chunk[col] == ""), f"{col} is empty")
+    for col in rules.get("numeric", ()):
+        bad = pd.to_numeric(chunk[col], errors="coerce").isna() & (chunk[col] != "")
+        reason = reason.mask((reason == "") & bad, f"{col} is not a number")
+    # Keys are compared as the cache holds them, e.g. amount "12.50" as 12.5
+    rows = frame_from_values(sheet_name, chunk.to_numpy().tolist())
+    key_cols = KEY_COLUMNS.get(sheet_name)
+    if key_cols:
+        # Against what is already in the sheet (earlier chunks included) and within this chunk
+        known = sheet_cache.index(f"{sheet_name}_by_key").rows
+        keys = [KeyIndex._key(k) for k in zip(*(rows[c] for c in key_cols))]
+        exists = pd.Series([k in known for k in keys]) | pd.Series(keys).duplicated()
+        reason = reason.mask((reason == "") & exists, "already exists")
+    ok = (reason == "").to_numpy()
+    return chunk[ok], rows[ok], list(zip(lines[~ok], reason[~ok]))
+
+def import_upload(sheet_name, upload, progress=None):
+    """Check an uploaded file against sheets_info and queue its good rows; returns (added, rejected)."""
+    cached_df(sheet_name)  # duplicate checks need the current sheet
+    if sheet_name in sheet_cache.stale:
+        raise ValueError(f"Could not read the {sheet_name} sheet from Google Sheets; try again shortly.")
+    ws = ws_by_name(sheet_name)
+    added, rejected, line = 0, [], 2  # line 1 is the header
+    for chunk in read_upload_chunks(upload):
+        missing = [c for c in sheets_info[sheet_name] if c not in chunk.columns]
+        if missing:
+            raise ValueError("Missing columns: " + ", ".join(missing))
+        text, rows, bad = check_import_chunk(sheet_name, chunk, line)
+        sheet_cache.append_frame(sheet_name, rows)
+        write_queue.put_many(sheet_name, ws, text.to_numpy().tolist())
+        metrics.queued_write(sheet_name, len(rows))
+        added += len(rows)
+        rejected += bad
+        line += len(chunk)
+        if progress is not None:
+            progress.text(f"Checked {line - 2} rows, {added} queued for {sheet_name}...")
+    return added, rejected
+
+def export_sheet(sheet_name, fmt):
+    """Serialize a cached sheet chunk by chunk into an in-memory file for st.download_button.
+
+    The whole file is held in memory; writing it in chunks only avoids a second
+    full-size copy of the frame (as one big string or Arrow table) on the way.
+    """
+    df = cached_df(sheet_name)
+    out = io.BytesIO()
+    if fmt == "parquet":
+        # Sheets hold text and mixed-type columns trip pyarrow, so store everything as strings
+        schema = pa.schema([(c, pa.string()) for c in df.columns])
+        with pq.ParquetWriter(out, schema) as writer:
+            for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+                part = df.iloc[start:start + EXPORT_CHUNK_ROWS].astype(str)
+                writer.write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False))
+    else:
+        out.write(df.iloc[:0].to_csv(index=False).encode())
+        for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+            out.write(df.iloc[start:start + EXPORT_CHUNK_ROWS].to_csv(index=False, header=False).encode())
+    out.seek(0)
+    return out
+
+# -----------------------
+# STREAMLIT UI
+# -----------------------
+st.set_page_config(page_title="EcoOne ERP", layout="wide")
+st.title("EcoOne ERP Prototype")
+with sheet_cache.lock:
+    stale_sheets = sorted(sheet_cache.stale.items())
+if stale_sheets:
+    stale_by_reason = {}
+    for name, reason in stale_sheets:
+        stale_by_reason.setdefault(reason, []).append(name)
+    st.warning("Could not read Google Sheets; showing the last loaded data for: "
+               + "; ".join(f"{', '.join(names)} ({reason})" for reason, names in stale_by_reason.items()))
+
+# Sidebar reset
+if st.sidebar.button("Reset Login / Logout"):
+    reset_login()
+
+menu = ["Login","Sign Up"]
+choice = st.sidebar.selectbox("Menu", menu)
+
+# -----------------------
+# SIGN UP
+# -----------------------
+if choice == "Sign Up":
+    st.subheader("Create Account")
+    su_username = st.text_input("Username", key="su_username")
+    su_password = st.text_input("Password", type="password", key="su_password")
+    su_role = st.selectbox("Role", ["Student","Faculty","Librarian","Hostel Warden","Admin"], key="su_role")
+    su_email = st.text_input("Email", key="su_email")
+    su_phone = st.text_input("Phone", key="su_phone")
+    if st.button("Create Account", key="create_account"):
+        try:
+            create_account(su_username, su_password, su_role, su_email, su_phone)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            st.success("Account created successfully! You can now login.")
+
+# -----------------------
+# LOGIN
+# -----------------------
+elif choice == "Login":
+    st.subheader("Login")
+    li_username = st.text_input("Username", key="login_username")
+    li_password = st.text_input("Password", type="password", key="login_password")
+    if st.button("Login", key="login_btn"):
+        role, canon_user = authenticate(li_username, li_password)
+        if role:
+            st.session_state.logged_in = True
+            st.session_state.user = canon_user
+            st.session_state.role = role
+            st.success(f"Logged in as {canon_user} ({role})")
+            load_all_once()  # make sure every sheet the dashboard needs is cached
+        else:
+            st.error("Invalid username or password.")
+
+# -----------------------
+# POST-LOGIN DASHBOARD
+# -----------------------
+if st.session_state.logged_in:
+    user = st.session_state.user
+    role = st.session_state.role
+    st.sidebar.markdown(f"**Logged in as:** {user} ({role})")
+    if st.sidebar.button("Logout"):
+        reset_login()
+    for notice in write_queue.take_notices(session_id()):
+        st.error(notice)
+    if role=="Admin" and write_queue.failed:
+        st.sidebar.warning("Some writes could not be saved to Google Sheets: "
+                           + "; ".join(f"{name}: {err}" for name, err in list(write_queue.failed)[-3:]))
+    if role=="Admin" and sheet_mirror and sheet_mirror["last_error"]:
+        st.sidebar.warning(f"Copying to Google Sheets keeps failing ({sheet_mirror['last_error']}); retrying.")
+    if role=="Admin" and st.sidebar.button("Re-check Sheet Headers"):
+        get_worksheets.clear()
+        st.rerun()
+
+    
+    st.subheader(f"Welcome, {user}!")
+    if role=="Admin":
+        st.subheader("Admin Dashboard")
+        tabs = st.tabs(["Overview","Manage Users","Recent Activity","Import / Export","Diagnostics"])
+        
+
+        with tabs[0]:
+            overview_panel()
+
+        with tabs[1], metrics.section("admin.users"):
+            st.markdown("### Users")
+            users_df = cached_df("users")
+            f1, f2 = st.columns(2)
+            f_user = f1.text_input("Username contains", key="users_f_user")
+            f_role = f2.selectbox("Role", ["All","Student","Faculty","Librarian","Hostel Warden","Admin"], key="users_f_role")
+            filters = []
+            if f_user.strip():
+                filters.append(("username", "contains", f_user.strip()))
+            if f_role != "All":
+                filters.append(("role", "eq", f_role))
+            paged_table("users", "users_sorted", filters, key="users_tbl")
+
+            st.markdown("#### Add User")
+            uu = st.text_input("Username",key="admin_user_add")
+            upw = st.text_input("Password",type="password",key="admin_user_pass")
+            urole = st.selectbox("Role",["Student","Faculty","Librarian","Hostel Warden","Admin"],key="admin_user_role")
+            if st.button("Add User",key="admin_user_add_btn"):
+                append_row("users",[uu,upw,urole,"",""])
+                st.session_state.force_rerun = not st.session_state.force_rerun
+                st.success("User added.")
+
+            st.markdown("#### Delete User")
+            del_user = st.selectbox("Select User to Delete", users_df["username"].tolist() if not users_df.empty else [], key="del_user")
+            if st.button("Delete User",key="del_user_btn"):
+                try:
+                    outcome = delete_user(del_user)
+                except (gspread.exceptions.APIError, SheetsThrottled, requests.exceptions.RequestException) as e:
+                    st.error(f"Delete failed, try again: {e}")
+                else:
+                    if outcome == "deleted":
+                        st.success(f"User {del_user} deleted.")
+                    elif outcome == "moved":
+                        st.warning(f"User {del_user} moved in the sheet while deleting and was not deleted; try again.")
+                    else:
+                        st.info(f"User {del_user} no longer exists.")
+
+        with tabs[2], metrics.section("admin.activity"):
+            st.markdown("### Recent Activity")
+            f1, f2, f3 = st.columns(3)
+            f_user = f1.text_input("Username contains", key="act_f_user")
+            f_role = f2.selectbox("Role", ["All","Student","Faculty","Librarian","Hostel Warden","Admin"], key="act_f_role")
+            f_action = f3.text_input("Action contains", key="act_f_action")
+            f4, f5 = st.columns(2)
+            f_from = f4.date_input("From", value=None, key="act_f_from")
+            f_to = f5.date_input("To", value=None, key="act_f_to")
+            filters = []
+            if f_user.strip():
+                filters.append(("username", "contains", f_user.strip()))
+            if f_role != "All":
+                filters.append(("role", "eq", f_role))
+            if f_action.strip():
+                filters.append(("action", "contains", f_action.strip()))
+            # Timestamps are "%Y-%m-%d %H:%M:%S" strings, which sort like the times they hold
+            if f_from:
+                filters.append(("timestamp", "ge", f_from.strftime("%Y-%m-%d")))
+            if f_to:
+                filters.append(("timestamp", "le", f_to.strftime("%Y-%m-%d") + " 23:59:59"))
+            paged_table("recent_activity", "recent_activity_sorted", filters, key="act_tbl", descending=True)
+
+            st.markdown("### Daily Activity")
+            st.caption(f"The list above keeps the last {ACTIVITY_HOT_DAYS} days (at most {ACTIVITY_HOT_ROWS} rows); "
+                       "older rows are moved to monthly recent_activity_YYYY_MM tabs and still counted here.")
+            daily = daily_activity()
+            if f_role != "All":
+                daily = daily[daily["role"] == f_role]
+            if f_from:
+                daily = daily[daily["date"] >= f_from.strftime("%Y-%m-%d")]
+            if f_to:
+                daily = daily[daily["date"] <= f_to.strftime("%Y-%m-%d")]
+            if daily.empty:
+                st.info("No activity in this range.")
+            else:
+                st.bar_chart(daily.pivot_table(index="date", columns="role", values="count", aggfunc="sum", fill_value=0))
+                st.dataframe(daily, hide_index=True)
+            if activity_compactor["last_error"]:
+                st.warning(f"Archiving old activity keeps failing ({activity_compactor['last_error']}); "
+                           "it is retried every hour.")
+            if st.button("Archive old activity now", key="act_compact"):
+                try:
+                    st.success(f"Moved {compact_activity()} rows to the monthly archive.")
+                except (gspread.exceptions.APIError, SheetsThrottled, requests.exceptions.RequestException) as e:
+                    st.error(f"Archiving failed, the rows are still in recent_activity: {e}")
+
+        with tabs[3], metrics.section("admin.import_export"):
+            st.subheader("Bulk Import")
+            imp_sheet = st.selectbox("Import into", IMPORT_SHEETS, key="imp_sheet")
+            st.caption("Expected columns: " + ", ".join(sheets_info[imp_sheet]) + ". Other columns are ignored.")
+            upload = st.file_uploader("CSV or XLSX file", type=["csv", "xlsx"], key="imp_file")
+            if st.button("Import", key="imp_btn", disabled=upload is None):
+                progress = st.empty()
+                try:
+                    added, rejected = import_upload(imp_sheet, upload, progress)
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    progress.empty()
+                    st.success(f"Added {added} rows to {imp_sheet}; they are being saved to Google Sheets in the background.")
+                    if rejected:
+                        st.warning(f"Skipped {len(rejected)} rows.")
+                        st.dataframe(pd.DataFrame(rejected[:500], columns=["file row", "reason"]), hide_index=True)
+                    if added:
+                        log_activity_local(user, role, f"Imported {imp_sheet} rows: {added}")
+
+            st.subheader("Export")
+            exp_sheet = st.selectbox("Sheet", list(sheets_info), key="exp_sheet")
+            exp_fmt = st.radio("Format", ["CSV"] + (["Parquet"] if pq else []), horizontal=True, key="exp_fmt")
+            if st.button("Prepare download", key="exp_btn"):
+                ext = exp_fmt.lower()
+                # on_click="ignore" keeps the button (and this page) as is while the file downloads
+                st.download_button(f"Download {exp_sheet}.{ext}", export_sheet(exp_sheet, ext),
+                                   file_name=f"{exp_sheet}.{ext}", key="exp_download", on_click="ignore",
+                                   mime="text/csv" if ext == "csv" else "application/vnd.apache.parquet")
+
+        with tabs[4]:
+            st.subheader("Diagnostics")
+            snap = metrics.snapshot()
+            st.caption(f"Process up {snap['uptime_seconds']:.0f}s, {len(snap['sessions'])} sessions seen. "
+                       "Latency percentiles are histogram bucket upper bounds.")
+            st.markdown("**Sheets API calls**")
+            st.dataframe(stat_table(snap["ops"], ["op", "sheet"]), hide_index=True)
+            st.markdown("**Cache lookups**")
+            cache = pd.DataFrame(snap["cache"], columns=["sheet", "result", "lookups"])
+            if not cache.empty:
+                cache = cache.pivot_table(index="sheet", columns="result", values="lookups", fill_value=0)
+                cache = cache.reindex(columns=["hit", "miss"], fill_value=0)
+                cache["hit %"] = (100 * cache["hit"] / (cache["hit"] + cache["miss"])).round(1)
+            st.dataframe(cache)
+            st.markdown("**Dashboard sections**")
+            st.dataframe(stat_table(snap["sections"], ["section"]).drop(columns=["errors", "KB"]), hide_index=True)
+            st.markdown("**Recent reruns**")
+            st.dataframe(pd.DataFrame(snap["reruns"][::-1]), hide_index=True)
+            st.markdown("**Sessions**")
+            st.dataframe(pd.DataFrame.from_dict(snap["sessions"], orient="index").fillna(0))
+            st.download_button("Download metrics.prom", metrics.to_prometheus(snap), "metrics.prom", key="diag_prom")
+            st.download_button("Download metrics.json", json.dumps(snap, indent=1), "metrics.json", key="diag_json")
+
+    # -----------------------
+    # Student Dashboard
+    # -----------------------
+    elif role=="Student":
+        with metrics.section("student"):
+            st.subheader("Student Dashboard")
+            students = cached_df("students")
+            idx = find_row_index_by_key("students",user)
+            if idx is not None:
+                row = students.loc[idx]
+                st.write("**Personal Info**")
+                st.write(row[["name","department","email","phone"]])
+                st.write("**Fees Status**")
+                st.write(row[["tution_fee_status","hostel_fee_status","exam_fee_status","transport_fee_status"]])
+                st.write("**Books Issued:**",row.get("books_issued",""))
+                st.write("**Hostel Room:**",row.get("hostel_room",""))
+
+                st.subheader("Submit Requests")
+                req_type = st.selectbox("Request Type", ["Library", "Hostel"], key="stu_req_type")
+                details = st.text_input("Details", key="stu_req_details")
+                if st.button("Submit Request", key="submit_req_btn"):
+                    if details.strip():
+                        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                        append_row("requests",[user, role, req_type, details.strip(), "Pending", ts])
+                        st.success(f"{req_type} request submitted successfully.")
+                        log_activity_local(user, role, f"Submitted {req_type} request: {details.strip()}")
+                    else:
+                        st.error("Please enter request details.")
+
+    # -----------------------
+    # Librarian Dashboard
+    # -----------------------
+    elif role=="Librarian":
+        with metrics.section("librarian"):
+            st.subheader("Librarian Dashboard")
+            st.markdown("### Pending Library Requests")
+            pending_request_queue("Library", "lib", user, role)
+            st.markdown("### Assigned Books Overview")
+            cached_df("students")
+            students, rows = sheet_cache.view("students_with_books", lambda ix: sorted(ix.rows))
+            assigned_books = students.loc[rows]
+            if not assigned_books.empty:
+                st.dataframe(assigned_books[["name","department","books_issued"]])
+            else:
+                st.info("No books assigned yet.")
+ 
+
+    # -----------------------
+    # Hostel Warden Dashboard
+    # -----------------------
+    elif role=="Hostel Warden":
+        with metrics.section("warden"):
+            st.subheader("Hostel Warden Dashboard")
+            st.markdown("### Pending Hostel Requests")
+            pending_request_queue("Hostel", "host", user, role)
+
+            st.markdown("### Assigned Hostel Rooms Overview")
+            cached_df("students")
+            students, rows = sheet_cache.view("students_with_room", lambda ix: sorted(ix.rows))
+            assigned_rooms = students.loc[rows]
+            if not assigned_rooms.empty:
+                st.dataframe(assigned_rooms[["name","department","hostel_room"]])
+            else:
+                st.info("No hostel rooms assigned yet.")
+
+metrics.end_rerun(st.session_state.role)
@@ -0,0 +1,58 @@
+# benchmarks/bench_load.py
+"""Cold-load benchmark: serial get_all_records per tab vs. the app's batched loader.
+
+Run from the repository root:
+
+    python benchmarks/bench_load.py --rows 2000 --latency 0.15
+"""
+import argparse
+import time
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import fake_sheets
+
+
+def bench_serial(spreadsheet, sheets_info):
+    spreadsheet.reset_calls()
+    start = time.perf_counter()
+    for name, header in sheets_info.items():
+        spreadsheet.sheets[name].get_all_records(expected_headers=header)
+    return spreadsheet.round_trips, time.perf_counter() - start
+
+
+def bench_app_cold_start(spreadsheet):
+    st.cache_resource.clear()
+    spreadsheet.reset_calls()
+    start = time.perf_counter()
+    at = AppTest.from_file(str(fake_sheets.APP_PATH), default_timeout=120).run()
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return dict(spreadsheet.calls), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000, help="data rows per worksheet")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per API round trip")
+    args = parser.parse_args()
+
+    sheets_info = fake_sheets.load_sheets_info()
+    spreadsheet = fake_sheets.FakeSpreadsheet(latency=args.latency)
+    spreadsheet.seed(sheets_info, rows_per_sheet=args.rows)
+    fake_sheets.install(spreadsheet)
+
+    trips, elapsed = bench_serial(spreadsheet, sheets_info)
+    print(f"serial get_all_records : {trips:3d} round trips  {elapsed * 1000:8.1f} ms")
+
+    calls, elapsed = bench_app_cold_start(spreadsheet)
+    reads = calls.get("values_batch_get", 0) + calls.get("get_all_records", 0)
+    print(f"app load (reads only)  : {reads:3d} round trips")
+    print(f"app cold start (total) : {sum(calls.values()):3d} round trips  {elapsed * 1000:8.1f} ms")
+    print("  " + ", ".join(f"{k}={v}" for k, v in sorted(calls.items())))
+
+
+if __name__ == "__main__":
+    main()
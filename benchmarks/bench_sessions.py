@@ -0,0 +1,165 @@
+# benchmarks/bench_sessions.py
+"""Load simulation: N sessions walk through the app's main flows against the fake Sheet.
+
+Each action (open the page, student login, submit a request, librarian/warden
+login, approve, admin login with the overview) runs for every session before
+the next action starts, so all N sessions are alive at once and share the
+process-wide caches, quota buckets and write-behind thread the way concurrent
+browser tabs do. AppTest is not thread-safe, so sessions take turns rather
+than running in parallel threads. After each round the harness waits for the
+write-behind thread to go quiet and charges the round's API calls to that action.
+
+A second pass repeats the flows under tracemalloc to measure memory per session.
+
+Run from the repository root:
+
+    python benchmarks/bench_sessions.py --sessions 20 --latency 0.1 --reads-per-min 60
+"""
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("METRICS_PATH", "")  # keep the app from writing metrics files
+
+import numpy as np
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import fake_sheets
+
+PASSWORD = "pass123"
+ACTIONS = ("open", "login_student", "submit", "login_staff", "approve", "admin_overview")
+
+
+def seed_campus(spreadsheet, sheets_info, sessions, rows):
+    """Filler rows in every sheet plus one student account per session and the staff accounts."""
+    spreadsheet.seed(sheets_info, rows_per_sheet=rows)
+    users = spreadsheet.sheets["users"].rows
+    students = spreadsheet.sheets["students"].rows
+    for i in range(sessions):
+        name = f"bench_student{i}"
+        users.append([name, PASSWORD, "Student", f"{name}@example.com", ""])
+        record = {"username": name, "name": f"Student {i}", "department": "CSE", "attendance_percentage": "90"}
+        students.append([record.get(col, "") for col in sheets_info["students"]])
+    for name, role in (("bench_admin", "Admin"), ("bench_librarian", "Librarian"), ("bench_warden", "Hostel Warden")):
+        users.append([name, PASSWORD, role, "", ""])
+
+
+def login(at, username):
+    at.text_input(key="login_username").input(username)
+    at.text_input(key="login_password").input(PASSWORD)
+    return at.button(key="login_btn").click().run()
+
+
+def act(action, at, i, timeout):
+    """Run one action for session i and return its AppTest."""
+    # Even sessions go through the library queue, odd ones through the hostel queue
+    req_type, staff, key = ("Library", "bench_librarian", "lib") if i % 2 == 0 else ("Hostel", "bench_warden", "host")
+    if action == "open":
+        return AppTest.from_file(str(fake_sheets.APP_PATH), default_timeout=timeout).run()
+    if action == "login_student":
+        return login(at, f"bench_student{i}")
+    if action == "submit":
+        at.selectbox(key="stu_req_type").select(req_type)
+        at.text_input(key="stu_req_details").input(f"bench request {i}")
+        return at.button(key="submit_req_btn").click().run()
+    if action == "login_staff":
+        return login(at, staff)
+    if action == "approve":
+        # Press "Select all" and approve; the first session per queue clears it, the rest find it empty
+        if not any(b.key == f"{key}_all" for b in at.button):
+            return at
+        at.button(key=f"{key}_all").click().run()
+        if not any(b.key == f"{key}_approve" for b in at.button):
+            return at  # emptied by another session since this one last rendered
+        return at.button(key=f"{key}_approve").click().run()
+    if action == "admin_overview":
+        return login(at, "bench_admin")
+    raise ValueError(action)
+
+
+def run_pass(spreadsheet, n, timeout, quiet, trace=False):
+    """Walk n sessions through ACTIONS; returns per-action stats and retained bytes per session."""
+    sessions = [None] * n
+    broken = set()  # sessions whose page failed; they sit out the remaining actions
+    memory = [0] * n
+    results = {}
+    for action in ACTIONS:
+        spreadsheet.reset_calls()
+        latencies, failures = [], []
+        for i in range(n):
+            if i in broken:
+                continue
+            before = tracemalloc.get_traced_memory()[0] if trace else 0
+            start = time.perf_counter()
+            try:
+                sessions[i] = act(action, sessions[i], i, timeout)
+                error = sessions[i].exception[0].message if sessions[i].exception else None
+            except (KeyError, RuntimeError) as e:  # widget missing, or the run hung
+                error = repr(e)
+            latencies.append(time.perf_counter() - start)
+            if trace:
+                memory[i] += tracemalloc.get_traced_memory()[0] - before
+            if error:
+                broken.add(i)
+                failures.append(f"session {i}: {error}")
+        spreadsheet.wait_idle(quiet)
+        results[action] = {"latencies": latencies, "calls": dict(spreadsheet.calls),
+                           "errors": dict(spreadsheet.errors), "failures": failures}
+    return results, memory
+
+
+def report(results, n):
+    """Print one line per action; errors are refused API calls, failed the sessions whose page broke."""
+    print(f"{'action':<16}{'calls/session':>14}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'failed':>8}  calls")
+    for action, r in results.items():
+        p50, p99 = np.percentile(r["latencies"], [50, 99]) * 1000 if r["latencies"] else (np.nan, np.nan)
+        calls = sum(r["calls"].values())
+        errors = sum(r["errors"].values())
+        detail = ", ".join(f"{k}={v}" for k, v in sorted({**r["calls"], **r["errors"]}.items()))
+        print(f"{action:<16}{calls / n:>14.2f}{p50:>10.1f}{p99:>10.1f}{errors:>8}{len(r['failures']):>8}  {detail}")
+    for action, r in results.items():
+        for failure in r["failures"][:3]:
+            print(f"  {action} failed for {failure}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10, help="simulated sessions")
+    parser.add_argument("--rows", type=int, default=1000, help="filler rows per worksheet")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per API round trip")
+    parser.add_argument("--reads-per-min", type=int, default=None, help="fake read quota (default: none)")
+    parser.add_argument("--writes-per-min", type=int, default=None, help="fake write quota (default: none)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls failing with 503")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds before a script run counts as hung")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    args = parser.parse_args()
+
+    sheets_info = fake_sheets.load_sheets_info()
+    spreadsheet = fake_sheets.FakeSpreadsheet(latency=args.latency, reads_per_min=args.reads_per_min,
+                                              writes_per_min=args.writes_per_min, error_rate=args.error_rate, seed=0)
+    seed_campus(spreadsheet, sheets_info, args.sessions, args.rows)
+    fake_sheets.install(spreadsheet)
+    # The app's write-behind thread waits half a second before sending
+    quiet = 1.0 + 2 * args.latency
+
+    st.cache_resource.clear()  # the first session starts cold
+    results, _ = run_pass(spreadsheet, args.sessions, args.timeout, quiet)
+    print(f"{args.sessions} sessions, {args.rows} rows per sheet, {args.latency * 1000:.0f} ms per round trip")
+    report(results, args.sessions)
+
+    if not args.no_memory:
+        gc.collect()
+        tracemalloc.start()
+        _, memory = run_pass(spreadsheet, args.sessions, args.timeout, quiet, trace=True)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        kib = np.array(memory) / 1024
+        print(f"memory per session (retained, warm process): median {np.median(kib):.0f} KiB, "
+              f"max {kib.max():.0f} KiB; peak traced {peak / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
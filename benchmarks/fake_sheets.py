@@ -0,0 +1,315 @@
+# benchmarks/fake_sheets.py
+"""In-memory stand-in for the parts of gspread's Spreadsheet/Worksheet API used by app.py.
+
+Every call that would be an HTTP request to Google counts as one round trip and
+sleeps for ``latency`` seconds, so that benchmarks show what the app costs
+without using a real Sheet. Optional per-minute read/write quotas and a random
+error rate make calls fail the way Google does (HTTP 429 / 503).
+"""
+import ast
+import collections
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+import gspread
+from gspread.utils import a1_to_rowcol, column_letter_to_index, numericise_all, rowcol_to_a1
+
+APP_PATH = Path(__file__).resolve().parent.parent / "app.py"
+
+
+def load_sheets_info(app_path=APP_PATH):
+    """Read the ``sheets_info`` dict literal from app.py without running the app."""
+    tree = ast.parse(Path(app_path).read_text())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(t, ast.Name) and t.id == "sheets_info" for t in node.targets
+        ):
+            return ast.literal_eval(node.value)
+    raise LookupError("sheets_info not found in app.py")
+
+
+def _parse_a1(a1):
+    m = re.fullmatch(r"([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?", a1)
+    if not m:
+        raise ValueError(f"Unsupported range {a1!r}")
+    first_col = column_letter_to_index(m[1])
+    first_row = int(m[2] or 1)
+    last_col = column_letter_to_index(m[3]) if m[3] else first_col
+    last_row = int(m[4]) if m[4] else None
+    return first_row, first_col, last_row, last_col
+
+
+# Methods that spend read quota; everything else spends write quota
+READ_METHODS = {"open_by_key", "worksheet", "worksheets", "row_values", "get", "get_all_records", "values_batch_get"}
+
+
+class FakeResponse:
+    """Just enough of requests.Response for gspread.exceptions.APIError."""
+
+    def __init__(self, status_code, message):
+        self.status_code = status_code
+        self.text = message
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": self.text}}
+
+
+class FakeWorksheet:
+    """One tab. Like a real one it has a grid size: appends and inserts grow it,
+    but writing cells past it fails with 400 until add_rows/add_cols make room."""
+
+    def __init__(self, spreadsheet, title, rows=None, grid=None):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.rows = [list(map(str, r)) for r in rows or []]
+        # A new Google Sheet tab has 1000 rows and 26 columns
+        self.grid = list(grid or (max(len(self.rows), 1000), max(self.col_width(), 26)))
+
+    def col_width(self):
+        return max((len(r) for r in self.rows), default=0)
+
+    @property
+    def row_count(self):
+        return self.grid[0]
+
+    @property
+    def col_count(self):
+        return self.grid[1]
+
+    def add_rows(self, rows):
+        self._call("add_rows")
+        self.grid[0] += rows
+
+    def add_cols(self, cols):
+        self._call("add_cols")
+        self.grid[1] += cols
+
+    def _fit(self, last_row, last_col):
+        """Fail like Google does for writes past the grid."""
+        if last_row > self.grid[0] or last_col > self.grid[1]:
+            raise gspread.exceptions.APIError(FakeResponse(
+                400, f"Range ({self.title}!{rowcol_to_a1(last_row, last_col)}) exceeds grid limits. "
+                     f"Max rows: {self.grid[0]}, max columns: {self.grid[1]}"))
+
+    def _grow(self):
+        self.grid = [max(self.grid[0], len(self.rows)), max(self.grid[1], self.col_width())]
+
+    def _call(self, method):
+        self.spreadsheet.round_trip(method)
+
+    def _read(self, a1=None):
+        if a1 is None:
+            out = [list(r) for r in self.rows]
+        else:
+            first_row, first_col, last_row, last_col = _parse_a1(a1)
+            out = [list(r[first_col - 1:last_col]) for r in self.rows[first_row - 1:last_row]]
+        while out and not any(out[-1]):
+            out.pop()
+        return out
+
+    def _set(self, row, col, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        cells = self.rows[row - 1]
+        while len(cells) < col:
+            cells.append("")
+        cells[col - 1] = str(value)
+
+    def row_values(self, row, **kwargs):
+        self._call("row_values")
+        return list(self.rows[row - 1]) if len(self.rows) >= row else []
+
+    def get(self, range_name=None, **kwargs):
+        self._call("get")
+        return self._read(range_name)
+
+    def get_all_records(self, expected_headers=None, **kwargs):
+        self._call("get_all_records")
+        values = self._read()
+        if not values:
+            return []
+        header, body = values[0], values[1:]
+        return [dict(zip(header, numericise_all(r + [""] * (len(header) - len(r))))) for r in body]
+
+    def insert_row(self, values, index=1, **kwargs):
+        self._call("insert_row")
+        self.rows.insert(index - 1, [str(v) for v in values])
+        self.grid[0] += 1
+        self._grow()
+
+    def append_row(self, values, **kwargs):
+        self._call("append_row")
+        self.rows.append([str(v) for v in values])
+        self._grow()
+
+    def append_rows(self, values, **kwargs):
+        self._call("append_rows")
+        self.rows.extend([str(v) for v in r] for r in values)
+        self._grow()
+
+    def update_cell(self, row, col, value):
+        self._call("update_cell")
+        self._fit(row, col)
+        self._set(row, col, value)
+
+    def batch_update(self, data, **kwargs):
+        self._call("batch_update")
+        for item in data:
+            row, col = a1_to_rowcol(item["range"].split(":")[0])
+            self._fit(row + len(item["values"]) - 1, col + max(map(len, item["values"]), default=1) - 1)
+        for item in data:
+            row, col = a1_to_rowcol(item["range"].split(":")[0])
+            for i, values in enumerate(item["values"]):
+                for j, value in enumerate(values):
+                    self._set(row + i, col + j, value)
+
+    def update(self, values=None, range_name=None, **kwargs):
+        self._call("update")
+        row, col = a1_to_rowcol((range_name or "A1").split(":")[0])
+        values = values or []
+        self._fit(row + len(values) - 1, col + max(map(len, values), default=1) - 1)
+        for i, cells in enumerate(values):
+            for j, value in enumerate(cells):
+                self._set(row + i, col + j, value)
+
+    def delete_rows(self, start_index, end_index=None):
+        self._call("delete_rows")
+        del self.rows[start_index - 1:(end_index or start_index)]
+        self.grid[0] -= (end_index or start_index) - start_index + 1
+
+    def batch_clear(self, ranges):
+        self._call("batch_clear")
+        for a1 in ranges:
+            first_row, first_col, last_row, last_col = _parse_a1(a1)
+            for cells in self.rows[first_row - 1:last_row]:
+                for col in range(first_col, min(last_col, len(cells)) + 1):
+                    cells[col - 1] = ""
+
+    def clear(self):
+        self._call("clear")
+        self.rows = []
+
+
+class FakeSpreadsheet:
+    """Holds the worksheets and counts round trips per gspread method.
+
+    ``reads_per_min``/``writes_per_min`` enforce a sliding one-minute quota like
+    Google's and answer 429 once it is spent; ``error_rate`` fails that share of
+    calls with a 503. Failed calls are counted in ``errors``, not ``calls``.
+    """
+
+    def __init__(self, latency=0.0, reads_per_min=None, writes_per_min=None, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.quota = {"read": reads_per_min, "write": writes_per_min}
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.sheets = {}
+        self.calls = collections.Counter()
+        self.errors = collections.Counter()
+        self.history = {"read": collections.deque(), "write": collections.deque()}
+        self.last_call = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refuse(self, kind, now):
+        """The status code a call made now should fail with, or None."""
+        window = self.history[kind]
+        while window and now - window[0] >= 60:
+            window.popleft()
+        if self.quota[kind] is not None and len(window) >= self.quota[kind]:
+            return 429
+        window.append(now)
+        if self.error_rate and self.random.random() < self.error_rate:
+            return 503
+        return None
+
+    def round_trip(self, method):
+        kind = "read" if method in READ_METHODS else "write"
+        with self.lock:
+            now = self.last_call = time.monotonic()
+            status = self._refuse(kind, now)
+            if status is None:
+                self.calls[method] += 1
+            else:
+                self.errors[f"{method}:{status}"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if status is not None:
+            message = "Quota exceeded" if status == 429 else "The service is currently unavailable."
+            raise gspread.exceptions.APIError(FakeResponse(status, message))
+
+    @property
+    def round_trips(self):
+        return sum(self.calls.values())
+
+    def reset_calls(self):
+        with self.lock:
+            self.calls.clear()
+            self.errors.clear()
+
+    def wait_idle(self, quiet=1.0, timeout=60.0):
+        """Block until no call has been made for ``quiet`` seconds, e.g. to let
+        the app's write-behind thread finish before counting calls."""
+        start = time.monotonic()
+        while time.monotonic() < start + timeout:
+            idle = time.monotonic() - max(self.last_call, start)
+            if idle >= quiet:
+                return True
+            time.sleep(quiet - idle)
+        return False
+
+    def seed(self, sheets_info, rows_per_sheet=0):
+        """Create every sheet with its header and ``rows_per_sheet`` generated rows."""
+        for name, header in sheets_info.items():
+            rows = [list(header)]
+            rows += [[f"{col}_{i}" for col in header] for i in range(rows_per_sheet)]
+            self.sheets[name] = FakeWorksheet(self, name, rows)
+
+    def worksheet(self, title):
+        self.round_trip("worksheet")
+        if title not in self.sheets:
+            raise gspread.WorksheetNotFound(title)
+        return self.sheets[title]
+
+    def worksheets(self):
+        self.round_trip("worksheets")
+        return list(self.sheets.values())
+
+    def add_worksheet(self, title, rows, cols, index=None):
+        self.round_trip("add_worksheet")
+        self.sheets[title] = FakeWorksheet(self, title, grid=(rows, cols))
+        return self.sheets[title]
+
+    def values_batch_get(self, ranges, params=None):
+        self.round_trip("values_batch_get")
+        value_ranges = []
+        for range_name in ranges:
+            title, a1 = range_name.rsplit("!", 1)
+            values = self.sheets[title.strip("'")]._read(a1)
+            value_ranges.append({"range": range_name, "values": values})
+        return {"valueRanges": value_ranges}
+
+
+class FakeClient:
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def open_by_key(self, key):
+        self.spreadsheet.round_trip("open_by_key")
+        return self.spreadsheet
+
+
+def install(spreadsheet):
+    """Make app.py's authenticate_gsheets() open ``spreadsheet`` instead of Google Sheets."""
+    import os
+    import sys
+    from google.oauth2.service_account import Credentials
+
+    # `streamlit run` puts the app's folder on sys.path, AppTest does not
+    if str(APP_PATH.parent) not in sys.path:
+        sys.path.insert(0, str(APP_PATH.parent))
+    os.environ["SERVICE_ACCOUNT_JSON"] = "{}"
+    Credentials.from_service_account_info = staticmethod(lambda info, scopes=None: None)
+    gspread.authorize = lambda creds: FakeClient(spreadsheet)
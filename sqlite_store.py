@@ -0,0 +1,238 @@
+# sqlite_store.py
+"""Local SQLite storage that stands in for the Google Sheet.
+
+SqliteSpreadsheet and SqliteWorksheet implement the subset of gspread's
+Spreadsheet/Worksheet API that app.py calls (worksheet, add_worksheet,
+values_batch_get, row_values, insert_row, delete_rows, get, get_all_records,
+append_row(s), update_cell, batch_update), so the app can switch storage without
+changing how it reads and writes. Row numbers follow the Sheet: row 1 is the
+header and row 2 is the first record, in insertion order.
+"""
+import json
+import re
+import sqlite3
+import threading
+
+import gspread
+from gspread.utils import a1_to_rowcol, column_letter_to_index, numericise_all, rowcol_to_a1
+
+# Columns that get an SQL index wherever a sheet has them. The app itself reads
+# whole tables into its cache and looks rows up there, so these only speed up
+# ad-hoc queries against the .db file (sqlite3 shell, reports), not app.py
+INDEXED_COLUMNS = ("username", "status", "request_type")
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _cell(value):
+    return "" if value is None else str(value)
+
+
+class SqliteWorksheet:
+    def __init__(self, store, title):
+        self.store = store
+        self.title = title
+        self.table = _quote(title)
+
+    @property
+    def header(self):
+        return self.store.headers[self.title]
+
+    def _rowids(self, first_row, last_row=None):
+        """rowids of sheet rows first_row..last_row (both >= 2), in order."""
+        limit = -1 if last_row is None else last_row - first_row + 1
+        cur = self.store.db.execute(
+            f"SELECT rowid FROM {self.table} ORDER BY rowid LIMIT ? OFFSET ?", (limit, first_row - 2)
+        )
+        return [r[0] for r in cur]
+
+    def _rows(self, first_row=2, last_row=None):
+        if not self.header:
+            return []
+        limit = -1 if last_row is None else max(last_row - first_row + 1, 0)
+        cols = ", ".join(_quote(c) for c in self.header)
+        cur = self.store.db.execute(
+            f"SELECT {cols} FROM {self.table} ORDER BY rowid LIMIT ? OFFSET ?", (limit, max(first_row - 2, 0))
+        )
+        return [[_cell(v) for v in r] for r in cur]
+
+    def _read(self, a1):
+        m = re.fullmatch(r"([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?", a1)
+        first_col = column_letter_to_index(m[1])
+        last_col = column_letter_to_index(m[3]) if m[3] else first_col
+        first_row = int(m[2] or 1)
+        last_row = int(m[4]) if m[4] else None
+        with self.store.lock:
+            values = [list(self.header)] if first_row == 1 and self.header else []
+            if last_row is None or last_row >= 2:
+                values += self._rows(max(first_row, 2), last_row)
+        return [row[first_col - 1:last_col] for row in values]
+
+    def _set_header(self, header):
+        existing = self.store.columns(self.title)
+        for col in header:
+            if col not in existing:
+                self.store.db.execute(f"ALTER TABLE {self.table} ADD COLUMN {_quote(col)} TEXT DEFAULT ''")
+            if col in INDEXED_COLUMNS:
+                self.store.db.execute(
+                    f"CREATE INDEX IF NOT EXISTS {_quote(self.title + '_' + col)} ON {self.table}({_quote(col)})"
+                )
+        self.store.headers[self.title] = list(header)
+        self.store.db.execute(
+            "INSERT OR REPLACE INTO _sheets(title, header) VALUES (?, ?)", (self.title, json.dumps(list(header)))
+        )
+
+    def _changed(self):
+        self.store.revisions[self.title] = self.store.revisions.get(self.title, 0) + 1
+
+    def row_values(self, row, **kwargs):
+        if row == 1:
+            return list(self.header)
+        rows = self._read(f"A{row}:ZZ{row}")
+        return rows[0] if rows else []
+
+    def get(self, range_name=None, **kwargs):
+        return self._read(range_name or "A1:ZZ")
+
+    def get_all_records(self, expected_headers=None, **kwargs):
+        with self.store.lock:
+            return [dict(zip(self.header, numericise_all(r))) for r in self._rows()]
+
+    def insert_row(self, values, index=1, **kwargs):
+        with self.store.lock, self.store.db:
+            if index == 1:
+                self._set_header(values)
+            else:
+                # Only the header is ever inserted by the app; anything else goes at the end
+                self._append([values])
+            self._changed()
+
+    def _append(self, rows):
+        cols = ", ".join(_quote(c) for c in self.header)
+        marks = ", ".join("?" for _ in self.header)
+        width = len(self.header)
+        self.store.db.executemany(
+            f"INSERT INTO {self.table}({cols}) VALUES ({marks})",
+            [[_cell(v) for v in list(r)[:width]] + [""] * (width - len(r)) for r in rows],
+        )
+
+    def append_row(self, values, **kwargs):
+        self.append_rows([values])
+
+    def append_rows(self, values, **kwargs):
+        with self.store.lock, self.store.db:
+            self._append(values)
+            self._changed()
+
+    def update_cell(self, row, col, value):
+        self.batch_update([{"range": f"{gspread.utils.rowcol_to_a1(row, col)}", "values": [[value]]}])
+
+    def batch_update(self, data, **kwargs):
+        with self.store.lock, self.store.db:
+            for item in data:
+                row, col = a1_to_rowcol(item["range"].split(":")[0])
+                for i, values in enumerate(item["values"]):
+                    rowids = self._rowids(row + i, row + i)
+                    if not rowids:
+                        continue
+                    for j, value in enumerate(values):
+                        name = self.header[col + j - 1]
+                        self.store.db.execute(
+                            f"UPDATE {self.table} SET {_quote(name)} = ? WHERE rowid = ?", (_cell(value), rowids[0])
+                        )
+            self._changed()
+
+    def delete_rows(self, start_index, end_index=None):
+        end_index = end_index or start_index
+        with self.store.lock, self.store.db:
+            if start_index == 1:
+                self.store.headers[self.title] = []
+                self.store.db.execute("UPDATE _sheets SET header = '[]' WHERE title = ?", (self.title,))
+                start_index = 2
+            if end_index >= start_index:
+                rowids = self._rowids(start_index, end_index)
+                self.store.db.executemany(f"DELETE FROM {self.table} WHERE rowid = ?", [(r,) for r in rowids])
+            self._changed()
+
+    def clear(self):
+        with self.store.lock, self.store.db:
+            self.store.db.execute(f"DELETE FROM {self.table}")
+            self._changed()
+
+
+class SqliteSpreadsheet:
+    """A SQLite file holding one table per worksheet."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS _sheets(title TEXT PRIMARY KEY, header TEXT)")
+        self.headers = {t: json.loads(h) for t, h in self.db.execute("SELECT title, header FROM _sheets")}
+        # Bumped on every write; mirror_to() uses them to skip unchanged sheets
+        self.revisions = {}
+        self.mirrored = {}
+
+    def columns(self, title):
+        return {r[1] for r in self.db.execute(f"PRAGMA table_info({_quote(title)})")}
+
+    def worksheet(self, title):
+        if title not in self.headers:
+            raise gspread.WorksheetNotFound(title)
+        return SqliteWorksheet(self, title)
+
+    def worksheets(self):
+        return [SqliteWorksheet(self, t) for t in self.headers]
+
+    def add_worksheet(self, title, rows=None, cols=None, index=None):
+        with self.lock, self.db:
+            self.db.execute(f"CREATE TABLE IF NOT EXISTS {_quote(title)} (_created TEXT DEFAULT CURRENT_TIMESTAMP)")
+            self.db.execute("INSERT OR IGNORE INTO _sheets(title, header) VALUES (?, '[]')", (title,))
+            self.headers.setdefault(title, [])
+        return SqliteWorksheet(self, title)
+
+    def values_batch_get(self, ranges, params=None):
+        value_ranges = []
+        for range_name in ranges:
+            title, a1 = range_name.rsplit("!", 1)
+            ws = self.worksheet(title.strip("'"))
+            value_ranges.append({"range": range_name, "values": ws._read(a1)})
+        return {"valueRanges": value_ranges}
+
+    def mirror_to(self, spreadsheet, call):
+        """Copy every sheet changed since the last call to a gspread Spreadsheet.
+
+        Each request goes through ``call(kind, fn, *args, **kwargs)``, e.g.
+        SheetsClient.call. A sheet is overwritten in place and only then are rows
+        past its new end cleared, so a failed round never leaves it empty.
+        """
+        for ws in self.worksheets():
+            revision = self.revisions.get(ws.title, 0)
+            if self.mirrored.get(ws.title) == revision:
+                continue
+            with self.lock:
+                values = [list(ws.header)] + ws._rows()
+            width = len(ws.header)
+            try:
+                target = call("read", spreadsheet.worksheet, ws.title)
+            except gspread.WorksheetNotFound:
+                target = call("write", spreadsheet.add_worksheet, title=ws.title, rows=max(len(values), 500), cols=20)
+            # update() fails with "exceeds grid limits" past the tab's grid, so make room first
+            if len(values) > target.row_count:
+                call("write", target.add_rows, len(values) - target.row_count)
+            if width > target.col_count:
+                call("write", target.add_cols, width - target.col_count)
+            call("write", target.update, values=values, range_name="A1", idempotent=True)
+            # Whatever the grid holds below or right of the new values is left from before
+            rows, cols = target.row_count, target.col_count
+            old = []
+            if rows > len(values):
+                old.append(f"A{len(values) + 1}:{rowcol_to_a1(rows, cols)}")
+            if cols > width:
+                old.append(f"{rowcol_to_a1(1, width + 1)}:{rowcol_to_a1(len(values), cols)}")
+            if old:
+                call("write", target.batch_clear, old, idempotent=True)
+            self.mirrored[ws.title] = revision
@@ -0,0 +1,76 @@
+# tests/conftest.py
+"""Fixtures for the offline regression tests: app.py imported once against the
+in-memory fake Sheet from benchmarks/fake_sheets.py.
+
+Run from the repository root:
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+from pathlib import Path
+
+import gspread
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+import fake_sheets
+
+os.environ.setdefault("METRICS_PATH", "")  # keep the app from writing metrics files
+
+
+@pytest.fixture(scope="session")
+def app():
+    """The app module, imported once in bare mode (no `streamlit run`)."""
+    spreadsheet = fake_sheets.FakeSpreadsheet()
+    spreadsheet.seed(fake_sheets.load_sheets_info())
+    fake_sheets.install(spreadsheet)
+    import app as module
+    return module
+
+
+@pytest.fixture
+def sheet(app, monkeypatch, tmp_path):
+    """A fresh fake Sheet with empty tabs, plus a fresh cache, client and write queue in app.
+
+    The write queue's own thread may flush at any time; tests call flush() to wait for it.
+    """
+    spreadsheet = fake_sheets.FakeSpreadsheet()
+    spreadsheet.seed(fake_sheets.load_sheets_info())
+    app.get_sheet_cache.clear()
+    cache = app.get_sheet_cache()
+    # No quota, so tests never wait for tokens
+    client = app.SheetsClient(10**9, 10**9, app.metrics)
+    monkeypatch.setattr(app, "spreadsheet", spreadsheet)
+    monkeypatch.setattr(app, "worksheet_objs", dict(spreadsheet.sheets))
+    monkeypatch.setattr(app, "sheet_cache", cache)
+    monkeypatch.setattr(app, "user_index", cache.index("users_by_name"))
+    monkeypatch.setattr(app, "sheets_client", client)
+    monkeypatch.setattr(app, "write_queue", app.WriteQueue(cache, client))
+    monkeypatch.setattr(app, "FAILED_WRITES_PATH", str(tmp_path / "failed_writes.jsonl"))
+    return spreadsheet
+
+
+def api_error(status):
+    message = "Quota exceeded" if status == 429 else f"HTTP {status}"
+    return gspread.exceptions.APIError(fake_sheets.FakeResponse(status, message))
+
+
+def fail_next(ws, method, status, landed=False):
+    """Make the next ws.<method> call fail with ``status``.
+
+    With landed=True the call takes effect first, like a response lost on its way back.
+    """
+    real = getattr(ws, method)
+    failed = []
+
+    def once(*args, **kwargs):
+        # Callers may hold on to this function and retry it, so later calls go through
+        if failed:
+            return real(*args, **kwargs)
+        failed.append(True)
+        if landed:
+            real(*args, **kwargs)
+        raise api_error(status)
+
+    ws.__dict__[method] = once
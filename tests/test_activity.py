@@ -0,0 +1,77 @@
+# tests/test_activity.py
+"""compact_activity against the fake Sheet: concurrent runs and runs that failed part-way."""
+import threading
+from datetime import datetime
+
+import gspread
+import pytest
+
+from conftest import fail_next
+
+NOW = datetime(2024, 3, 1)  # with ACTIVITY_HOT_DAYS = 30, rows before 2024-01-31 are old
+OLD = [["007", "Student", f"Submitted Library request: Book {i}", f"2024-01-{i:02d} 10:00:00"] for i in range(1, 11)]
+RECENT = [["admin", "Admin", "Approved library request 007", f"2024-02-{i:02d} 10:00:00"] for i in range(20, 25)]
+
+
+@pytest.fixture
+def activity(app, sheet, monkeypatch):
+    monkeypatch.setattr(app, "ACTIVITY_HOT_DAYS", 30)
+    monkeypatch.setattr(app, "ACTIVITY_HOT_ROWS", 5000)
+    sheet.sheets["recent_activity"].rows += [list(r) for r in OLD + RECENT]
+    app.load_sheets(["recent_activity", "activity_daily"])
+    return sheet
+
+
+def daily(sheet):
+    return sorted(tuple(r) for r in sheet.sheets["activity_daily"].get()[1:])
+
+
+EXPECTED_DAILY = sorted((f"2024-01-{i:02d}", "Student", "Submitted library request", "1") for i in range(1, 11))
+
+
+def test_concurrent_compactions_move_each_row_once(app, activity):
+    threads = [threading.Thread(target=app.compact_activity, args=(NOW,)) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert activity.sheets["recent_activity"].get()[1:] == RECENT
+    assert activity.sheets["recent_activity_2024_01"].get()[1:] == OLD
+    assert daily(activity) == EXPECTED_DAILY
+    assert app.cached_df("recent_activity")["timestamp"].tolist() == [r[3] for r in RECENT]
+
+
+def test_compaction_repeated_after_a_failed_delete(app, activity):
+    fail_next(activity.sheets["recent_activity"], "delete_rows", 400)
+    with pytest.raises(gspread.exceptions.APIError):
+        app.compact_activity(NOW)
+    assert daily(activity) == []  # still in recent_activity, so counted there only
+    assert app.daily_activity()["count"].tolist() == [1] * 15
+    assert app.compact_activity(NOW) == 10
+    assert activity.sheets["recent_activity"].get()[1:] == RECENT
+    assert activity.sheets["recent_activity_2024_01"].get()[1:] == OLD  # not archived twice
+    assert daily(activity) == EXPECTED_DAILY  # not counted twice
+
+
+def test_counts_that_failed_to_write_are_written_next_run(app, activity):
+    fail_next(activity.sheets["activity_daily"], "append_rows", 400)
+    with pytest.raises(gspread.exceptions.APIError):
+        app.compact_activity(NOW)
+    assert activity.sheets["recent_activity"].get()[1:] == RECENT
+    assert app.compact_activity(NOW) == 0  # nothing left to move, but the counts are owed
+    assert daily(activity) == EXPECTED_DAILY
+
+
+def test_compaction_keeps_rows_that_moved_before_the_delete(app, activity):
+    ws = activity.sheets["recent_activity"]
+    real_get, reads = ws.get, []
+
+    def get(range_name=None, **kwargs):
+        reads.append(range_name)
+        if len(reads) == 2:  # the check before deleting: another process compacted meanwhile
+            del ws.rows[1:4]
+        return real_get(range_name, **kwargs)
+
+    ws.get = get
+    assert app.compact_activity(NOW) == 0
+    assert ws.rows[1:] == OLD[3:] + RECENT
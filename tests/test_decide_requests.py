@@ -0,0 +1,39 @@
+# tests/test_decide_requests.py
+"""Bulk approve/reject of requests by id, as the pending queues send them."""
+REQUESTS = [["s1", "Student", "Library", "Book 1", "Pending", "2024-05-01 10:00:00"],
+            ["s2", "Student", "Hostel", "101", "Pending", "2024-05-01 10:00:01"],
+            ["s1", "Student", "Library", "Book 2", "Approved", "2024-05-01 10:00:02"]]
+
+
+def request_id(row):
+    return (row[0], row[2], row[3], row[5])
+
+
+def seed(app, sheet):
+    sheet.sheets["requests"].rows += [list(r) for r in REQUESTS]
+    sheet.sheets["students"].rows += [["s1"] + [""] * 11, ["s2"] + [""] * 11]
+
+
+def students(sheet):
+    return {r[0]: (r[10], r[11]) for r in sheet.sheets["students"].rows[1:]}
+
+
+def test_approve_skips_decided_and_missing_requests(app, sheet):
+    seed(app, sheet)
+    gone = ("s9", "Library", "Book 9", "2024-05-01 09:00:00")
+    ids = [request_id(r) for r in REQUESTS] + [gone]
+    assert app.decide_requests(ids, True, "admin", "Admin") == 2
+    app.write_queue.flush()
+    assert [r[4] for r in sheet.sheets["requests"].rows[1:]] == ["Approved"] * 3
+    assert students(sheet) == {"s1": ("Book 1", ""), "s2": ("", "101")}
+    assert [r[2] for r in sheet.sheets["recent_activity"].rows[1:]] == [
+        "Approved library request s1", "Approved hostel request s2"]
+
+
+def test_reject_changes_only_the_status(app, sheet):
+    seed(app, sheet)
+    assert app.decide_requests([request_id(REQUESTS[0])], False, "admin", "Admin") == 1
+    app.write_queue.flush()
+    assert [r[4] for r in sheet.sheets["requests"].rows[1:]] == ["Rejected", "Pending", "Approved"]
+    assert students(sheet) == {"s1": ("", ""), "s2": ("", "")}
+    assert app.decide_requests([request_id(REQUESTS[0])], True, "admin", "Admin") == 0  # already decided
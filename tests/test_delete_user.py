@@ -0,0 +1,51 @@
+# tests/test_delete_user.py
+"""delete_user against the fake Sheet: the read-back check and Sheets errors."""
+import gspread
+import pytest
+
+from conftest import fail_next
+
+USERS = [["a", "x", "Student", "", ""], ["b", "x", "Student", "", ""], ["c", "x", "Admin", "", ""]]
+
+
+@pytest.fixture
+def users(app, sheet):
+    sheet.sheets["users"].rows += [list(r) for r in USERS]
+    app.load_sheets(["users"])
+    return sheet.sheets["users"]
+
+
+def test_deletes_the_row_and_the_cached_copy(app, users):
+    assert app.delete_user("b") == "deleted"
+    assert [r[0] for r in users.rows[1:]] == ["a", "c"]
+    assert app.sheet_cache.get("users")["username"].tolist() == ["a", "c"]
+    assert app.find_row_index_by_key("users", "c") == 1
+
+
+def test_missing_user(app, users):
+    assert app.delete_user("z") == "missing"
+    assert len(users.rows) == 4
+
+
+def test_row_that_keeps_moving_is_not_deleted(app, users, monkeypatch):
+    users.rows.insert(1, ["new", "x", "Student", "", ""])  # added in the Sheet itself
+    monkeypatch.setattr(app.write_queue, "busy", lambda name: True)  # so the reload is held back
+    assert app.delete_user("b") == "moved"
+    assert len(users.rows) == 5
+
+
+def test_failed_delete_raises_and_reloads(app, users):
+    fail_next(users, "delete_rows", 503)
+    with pytest.raises(gspread.exceptions.APIError):
+        app.delete_user("b")
+    assert not app.sheet_cache.is_fresh("users")
+    assert len(users.rows) == 4
+
+
+def test_throttled_read_back_raises(app, users, monkeypatch):
+    client = app.SheetsClient(1, 10**9, app.metrics)
+    client.buckets["read"].tokens = 0  # next token in a minute, past READ_MAX_WAIT
+    monkeypatch.setattr(app, "sheets_client", client)
+    with pytest.raises(app.SheetsThrottled):
+        app.delete_user("b")
+    assert len(users.rows) == 4
@@ -0,0 +1,44 @@
+# tests/test_import.py
+"""Bulk import of uploaded files into the fake Sheet, and export back out."""
+import io
+
+
+def upload(text, name="upload.csv"):
+    f = io.BytesIO(text.encode())
+    f.name = name
+    return f
+
+
+def test_import_writes_the_file_text_as_is(app, sheet):
+    header = ",".join(app.sheets_info["students"])
+    added, rejected = app.import_upload("students", upload(
+        f"{header}\n 007 ,Bond,CSE,,0987654321,12.50,,,,,,\nstudent2,Jane,ECE,,,,,,,,,\n"))
+    app.write_queue.flush()
+    assert (added, rejected) == (2, [])
+    rows = sheet.sheets["students"].rows[1:]
+    assert rows[0][:6] == ["007", "Bond", "CSE", "", "0987654321", "12.50"]
+    # The cache holds what the next read returns: text columns as text, numbers as numbers
+    assert app.sheet_cache.get("students").loc[0, ["username", "phone", "attendance_percentage"]].tolist() == ["007", "0987654321", 12.5]
+
+
+def test_import_skips_rows_already_in_the_sheet(app, sheet):
+    header = ",".join(app.sheets_info["students"])
+    app.import_upload("students", upload(f"{header}\n007,Bond,,,,,,,,,,\n"))
+    added, rejected = app.import_upload("students", upload(f"{header}\n 007,Bond,,,,,,,,,,\n"))
+    app.write_queue.flush()
+    assert (added, rejected) == (0, [(2, "already exists")])
+    assert [r[0] for r in sheet.sheets["students"].rows[1:]] == ["007"]
+
+
+def test_import_rejects_amounts_that_are_not_numbers(app, sheet):
+    header = ",".join(app.sheets_info["payments"])
+    added, rejected = app.import_upload("payments", upload(
+        f"{header}\na,Tuition,100,2024-05-01,Pending\nb,Hostel,12x,2024-05-01,Pending\n"))
+    assert (added, rejected) == (1, [(3, "amount is not a number")])
+
+
+def test_export_returns_the_cached_sheet_as_a_file(app, sheet, monkeypatch):
+    monkeypatch.setattr(app, "EXPORT_CHUNK_ROWS", 2)
+    sheet.sheets["payments"].rows += [[f"s{i}", "Tuition", "100", "2024-05-01", "Pending"] for i in range(5)]
+    out = app.export_sheet("payments", "csv")
+    assert out.read().decode().splitlines() == [",".join(r) for r in sheet.sheets["payments"].rows]
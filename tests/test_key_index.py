@@ -0,0 +1,26 @@
+# tests/test_key_index.py
+"""KeyIndex row offsets after deletes from the cached sheet."""
+import pandas as pd
+
+from test_tail_reads import requests_frame
+
+
+def key(df, row_idx):
+    return df.loc[row_idx, ["username", "request_type", "details", "timestamp"]].tolist()
+
+
+def test_key_index_moves_rows_below_a_delete_up(app, sheet):
+    df = requests_frame(app, 4)
+    app.sheet_cache.put("requests", df)
+    index = app.sheet_cache.index("requests_by_key")
+    app.sheet_cache.drop_row("requests", 1)
+    assert index.lookup(*key(df, 1)) is None
+    assert [index.lookup(*key(df, i)) for i in (0, 2, 3)] == [0, 1, 2]
+
+
+def test_key_index_falls_back_to_a_duplicate_after_delete(app, sheet):
+    users = pd.DataFrame([["a", "x", "Student", "", ""], ["b", "x", "Student", "", ""], ["a", "y", "Admin", "", ""]],
+                         columns=app.sheets_info["users"])
+    app.sheet_cache.put("users", users)
+    app.sheet_cache.drop_row("users", 0)
+    assert app.sheet_cache.index("users_by_key").lookup("a") == 1
@@ -0,0 +1,26 @@
+# tests/test_live.py
+"""The change probe's reads: new rows plus the status column of rows already cached."""
+from test_tail_reads import cached_rows, recorded_ranges, requests_frame
+
+
+def test_status_edit_to_an_existing_row_is_read(app, sheet):
+    rows = sheet.sheets["requests"].rows
+    rows += requests_frame(app, 3).astype(str).to_numpy().tolist()
+    app.load_sheets(["requests"])
+    rows[1][4] = "Approved"  # decided by another process
+    ranges = recorded_ranges(sheet)
+    app.load_sheets(["requests"], check=app.LIVE_CHECK_COLUMNS)
+    assert ranges == [["'requests'!A4:F", "'requests'!E2:E4"], ["'requests'!A1:F"]]
+    assert cached_rows(app, "requests") == rows[1:]
+    assert app.sheet_cache.index("requests_pending").rows("Library") == [1, 2]
+
+
+def test_unchanged_sheet_costs_one_round_trip(app, sheet):
+    rows = sheet.sheets["requests"].rows
+    rows += requests_frame(app, 3).astype(str).to_numpy().tolist()
+    app.load_sheets(["requests"])
+    version = app.sheet_cache.versions["requests"]
+    ranges = recorded_ranges(sheet)
+    app.load_sheets(["requests"], check=app.LIVE_CHECK_COLUMNS)
+    assert len(ranges) == 1
+    assert app.sheet_cache.versions["requests"] == version  # nothing for live panels to redraw
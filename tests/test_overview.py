@@ -0,0 +1,41 @@
+# tests/test_overview.py
+"""PaymentStats kept up to date by appends and edits, and the overview built from it."""
+import pandas as pd
+
+STUDENTS = [["s1", "Ann", "CSE"], ["s2", "Ben", "ECE"], ["s3", "Cy", "CSE"]]
+PAYMENTS = [["s1", "Tuition", "100", "2024-05-01", "Pending"],
+            ["s2", "Hostel", "50", "2024-05-01", "Paid"],
+            ["s3", "Tuition", "100", "2024-05-02", " pending "]]
+
+
+def seed(app, sheet):
+    sheet.sheets["users"].rows += [[u, "x", "Student", "", ""] for u, _, _ in STUDENTS] + [["admin", "x", "Admin", "", ""]]
+    sheet.sheets["students"].rows += [s + [""] * 9 for s in STUDENTS]
+    sheet.sheets["payments"].rows += [list(p) for p in PAYMENTS]
+    app.load_sheets(app.OVERVIEW_SHEETS)
+
+
+def stats(app):
+    s = app.sheet_cache.index("payments_stats")
+    return s.total, dict(s.pending), dict(s.by_user), dict(s.by_fee)
+
+
+def test_payment_stats_follow_appends_and_edits_like_a_rebuild(app, sheet):
+    seed(app, sheet)
+    assert stats(app) == (3, {0: ("s1", "Tuition"), 2: ("s3", "Tuition")}, {"s1": 1, "s3": 1}, {"Tuition": 2})
+    app.sheet_cache.append("payments", ["s2", "Exam", "20", "2024-05-03", "Pending"])
+    app.sheet_cache.set_value("payments", 0, "status", "Paid")
+    incremental = stats(app)
+    assert incremental == (4, {2: ("s3", "Tuition"), 3: ("s2", "Exam")}, {"s3": 1, "s2": 1}, {"Tuition": 1, "Exam": 1})
+    app.sheet_cache.index("payments_stats").rebuild(app.sheet_cache.get("payments"))
+    assert stats(app) == incremental
+
+
+def test_overview_groups_pending_payments_by_department(app, sheet):
+    seed(app, sheet)
+    agg = app.overview_aggregates()
+    assert (agg["total_students"], agg["total_payments"], agg["pending_count"]) == (3, 3, 2)
+    assert agg["pending_df"]["name"].tolist() == ["Ann", "Cy"]
+    assert agg["by_department"].equals(pd.DataFrame([["CSE", 2]], columns=["department", "pending"]))
+    app.sheet_cache.set_value("payments", 2, "status", "Paid")
+    assert app.overview_aggregates()["pending_count"] == 1  # rebuilt once payments changed
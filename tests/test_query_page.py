@@ -0,0 +1,30 @@
+# tests/test_query_page.py
+"""query_page slicing pages out of a SortedIndex, with and without filters."""
+
+
+def activity(n):
+    # Out of timestamp order on purpose, so the index has to sort them
+    return [[f"user{i % 3}", "Student", f"Action {i}", f"2024-05-01 10:00:{(7 * i) % n:02d}"] for i in range(n)]
+
+
+def page(app, filters, number, size, descending=False):
+    df, total = app.query_page("recent_activity", "recent_activity_sorted", filters, number, size, descending)
+    return df["timestamp"].tolist(), total
+
+
+def test_pages_follow_the_sort_column(app, sheet):
+    sheet.sheets["recent_activity"].rows += activity(10)
+    stamps = [f"2024-05-01 10:00:{s:02d}" for s in range(10)]
+    assert page(app, [], 0, 4) == (stamps[:4], 10)
+    assert page(app, [], 2, 4) == (stamps[8:], 10)
+    assert page(app, [], 0, 4, descending=True) == (stamps[::-1][:4], 10)
+    assert page(app, [], 3, 4) == ([], 10)
+
+
+def test_filtered_pages_see_rows_appended_after_the_first_query(app, sheet):
+    sheet.sheets["recent_activity"].rows += activity(10)
+    filters = [("username", "eq", "USER1")]
+    first, total = page(app, filters, 0, 25)
+    assert total == 3 and first == sorted(first)
+    app.append_row("recent_activity", ["user1", "Student", "Action 10", "2024-05-01 10:00:59"])
+    assert page(app, filters, 0, 25) == (first + ["2024-05-01 10:00:59"], 4)
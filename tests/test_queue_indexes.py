@@ -0,0 +1,35 @@
+# tests/test_queue_indexes.py
+"""PendingQueues and NonEmptyRows kept in place by appends, edits and deletes."""
+import pandas as pd
+
+from test_tail_reads import requests_frame
+
+
+def queues(app):
+    ix = app.sheet_cache.index("requests_pending")
+    return {t: ix.rows(t) for t in ("Library", "Hostel")}
+
+
+def test_pending_queues_follow_status_and_type_edits(app, sheet):
+    df = requests_frame(app, 3)
+    df.loc[1, "request_type"] = "Hostel"
+    app.sheet_cache.put("requests", df)
+    assert queues(app) == {"Library": [0, 2], "Hostel": [1]}
+    app.sheet_cache.set_value("requests", 0, "status", "Approved")
+    app.sheet_cache.set_value("requests", 2, "request_type", "Hostel")
+    app.sheet_cache.append("requests", ["s9", "Student", "Library", "Book 9", "Pending", "2024-05-02 10:00:00"])
+    assert queues(app) == {"Library": [3], "Hostel": [1, 2]}
+    app.sheet_cache.drop_row("requests", 1)
+    assert queues(app) == {"Library": [2], "Hostel": [1]}
+
+
+def test_non_empty_rows_follow_edits_to_their_column(app, sheet):
+    students = pd.DataFrame([["s1"] + [""] * 11, ["s2"] + [""] * 10 + ["101"]], columns=app.sheets_info["students"])
+    app.sheet_cache.put("students", students)
+    rooms = app.sheet_cache.index("students_with_room")
+    books = app.sheet_cache.index("students_with_books")
+    assert (rooms.rows, books.rows) == ({1}, set())
+    app.sheet_cache.set_value("students", 0, "books_issued", "Book 1")
+    app.sheet_cache.set_value("students", 1, "hostel_room", "")
+    app.sheet_cache.append("students", ["s3"] + [""] * 10 + ["202"])
+    assert (rooms.rows, books.rows) == ({2}, {0})
@@ -0,0 +1,34 @@
+# tests/test_sheets_client.py
+"""SheetsClient's call metrics and the Metrics totals behind them."""
+from sqlite_store import SqliteSpreadsheet
+
+
+def test_calls_are_labelled_by_worksheet_only(app, tmp_path):
+    metrics = app.Metrics()
+    client = app.SheetsClient(10**9, 10**9, metrics)
+    store = SqliteSpreadsheet(str(tmp_path / "store.db"))
+    store.title = "EcoOne"  # like gspread.Spreadsheet, which has a title too
+    ws = client.call("write", store.add_worksheet, "payments")
+    client.call("write", ws.insert_row, ["username", "amount"], index=1)
+    client.call("read", store.values_batch_get, ["'payments'!A1:B"])
+    labels = {(op["op"], op["sheet"]) for op in metrics.snapshot()["ops"]}
+    assert labels == {("add_worksheet", "*"), ("insert_row", "payments"), ("values_batch_get", "*")}
+
+
+def test_payload_bytes_sums_cell_text(app):
+    response = {"spreadsheetId": "id", "valueRanges": [{"range": "users!A1:B2", "values": [["ab", "c"], ["1234"]]}]}
+    assert app.payload_bytes(response) == len("id") + len("users!A1:B2") + 7
+    assert app.payload_bytes(([["a", 12], ["bcd"]],)) == 6  # append_rows args
+    assert app.payload_bytes((2, 3, "Approved")) == 10  # update_cell args
+    assert app.payload_bytes(None) == 0
+
+
+def test_session_totals_keep_the_most_recent_sessions(app):
+    metrics = app.Metrics()
+    for sid in [f"s{i}" for i in range(505)] + ["s0"]:
+        metrics.local.rerun = {"session": sid, "queued_writes": 0}
+        metrics.queued_write("users")
+    sessions = metrics.snapshot()["sessions"]
+    assert len(sessions) == 500
+    assert [f"s{i}" in sessions for i in range(7)] == [True] + [False] * 5 + [True]
+    assert sessions["s0"] == {"queued_writes": 1}  # counted afresh after it was dropped
@@ -0,0 +1,57 @@
+# tests/test_sqlite_mirror.py
+"""SqliteSpreadsheet.mirror_to copying a local store to the fake Sheet."""
+import gspread
+import pytest
+
+import fake_sheets
+from conftest import fail_next
+from sqlite_store import SqliteSpreadsheet
+
+HEADER = ["username", "fee_type", "amount"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SqliteSpreadsheet(str(tmp_path / "store.db"))
+    ws = store.add_worksheet("payments")
+    ws.insert_row(HEADER, index=1)
+    ws.append_rows([["a", "Tuition", "10"], ["b", "Hostel", "20"], ["c", "Exam", "30"]])
+    return store
+
+
+@pytest.fixture
+def target():
+    return fake_sheets.FakeSpreadsheet()
+
+
+@pytest.fixture
+def client(app):
+    return app.SheetsClient(10**9, 10**9, app.metrics)
+
+
+def test_mirror_trims_rows_past_the_new_end(store, target, client):
+    store.mirror_to(target, client.call)
+    store.worksheet("payments").delete_rows(3, 4)
+    store.mirror_to(target, client.call)
+    assert target.sheets["payments"].get() == [HEADER, ["a", "Tuition", "10"]]
+    assert target.calls["clear"] == 0
+
+
+def test_failed_mirror_keeps_the_old_copy(store, target, client):
+    store.mirror_to(target, client.call)
+    store.worksheet("payments").append_rows([["d", "Transport", "40"]])
+    fail_next(target.sheets["payments"], "update", 400)
+    with pytest.raises(gspread.exceptions.APIError):
+        store.mirror_to(target, client.call)
+    assert len(target.sheets["payments"].get()) == 4
+    store.mirror_to(target, client.call)  # not marked as mirrored, so it is copied again
+    assert target.sheets["payments"].get()[-1] == ["d", "Transport", "40"]
+
+
+def test_mirror_grows_a_tab_smaller_than_the_table(store, target, client):
+    store.mirror_to(target, client.call)
+    target.sheets["payments"].grid = [4, 3]  # e.g. trimmed by hand in the Sheets UI
+    store.worksheet("payments").append_rows([["d", "Transport", "40"], ["e", "Library", "5"]])
+    store.mirror_to(target, client.call)
+    assert target.sheets["payments"].get()[-2:] == [["d", "Transport", "40"], ["e", "Library", "5"]]
+    assert target.sheets["payments"].grid == [6, 3]
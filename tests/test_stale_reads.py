@@ -0,0 +1,46 @@
+# tests/test_stale_reads.py
+"""Reads that fail: the last frame is served, marked stale with the reason why."""
+import pytest
+import requests
+
+from conftest import fail_next
+
+
+@pytest.fixture
+def users(app, sheet, monkeypatch):
+    monkeypatch.setattr(app, "API_MAX_RETRIES", 1)  # fail at once instead of backing off
+    sheet.sheets["users"].rows.append(["a", "x", "Student", "", ""])
+    app.load_sheets(["users"])
+    app.sheet_cache.invalidate("users")
+    return sheet
+
+
+def test_network_error_serves_the_last_frame(app, users, monkeypatch):
+    def unreachable(ranges, params=None):
+        raise requests.exceptions.ConnectionError("connection reset")
+
+    monkeypatch.setattr(users, "values_batch_get", unreachable)
+    app.load_all_once()  # runs at import for every page, so it must not raise
+    assert app.sheet_cache.get("users")["username"].tolist() == ["a"]
+    assert app.sheet_cache.stale["users"] == "could not reach Google Sheets"
+
+
+def test_reason_tells_rate_limits_from_other_errors(app, users):
+    fail_next(users, "values_batch_get", 403)
+    app.load_sheets(["users"])
+    assert app.sheet_cache.stale == {"users": "error 403 from Google Sheets"}
+    app.load_sheets(["users"])
+    assert app.sheet_cache.stale == {}
+    assert app.read_failure(app.SheetsThrottled("read")) == "rate limited"
+
+
+def test_sign_up_waits_for_a_users_read(app, users, monkeypatch):
+    monkeypatch.setattr(app, "STALE_RETRY_AFTER", 0)
+    fail_next(users, "values_batch_get", 503)
+    with pytest.raises(ValueError, match="Could not read the users sheet"):
+        app.create_account("b", "pw", "Student", "", "")
+    with pytest.raises(ValueError, match="already exists"):
+        app.create_account(" A ", "pw", "Student", "", "")  # read again
+    app.create_account("b", "pw", "Student", "", "")
+    app.write_queue.flush()
+    assert [r[0] for r in users.sheets["users"].rows[1:]] == ["a", "b"]
@@ -0,0 +1,62 @@
+# tests/test_tail_reads.py
+"""load_sheets reading append-only sheets from their last cached row onwards."""
+import pandas as pd
+
+
+def requests_frame(app, n):
+    rows = [[f"student{i}", "Student", "Library", f"Book {i}", "Pending", f"2024-05-01 10:00:0{i}"] for i in range(n)]
+    return pd.DataFrame(rows, columns=app.sheets_info["requests"])
+
+
+def sheet_rows(spreadsheet, name):
+    return spreadsheet.sheets[name].rows
+
+
+def recorded_ranges(spreadsheet):
+    """Wrap values_batch_get so the test can see which ranges were read."""
+    ranges, real = [], spreadsheet.values_batch_get
+
+    def spy(rs, params=None):
+        ranges.append(list(rs))
+        return real(rs, params)
+
+    spreadsheet.values_batch_get = spy
+    return ranges
+
+
+def cached_rows(app, name):
+    return app.sheet_cache.get(name).astype(str).to_numpy().tolist()
+
+
+def test_tail_read_fetches_only_new_rows(app, sheet):
+    rows = sheet_rows(sheet, "requests")
+    rows += requests_frame(app, 3).astype(str).to_numpy().tolist()
+    app.load_sheets(["requests"])
+    rows += requests_frame(app, 5).iloc[3:].astype(str).to_numpy().tolist()
+    ranges = recorded_ranges(sheet)
+    app.load_sheets(["requests"])
+    # Data row 3 is sheet row 4: re-read as the anchor, followed by the new rows
+    assert ranges == [["'requests'!A4:F"]]
+    assert cached_rows(app, "requests") == rows[1:]
+
+
+def test_tail_read_resyncs_when_the_anchor_row_changed(app, sheet):
+    rows = sheet_rows(sheet, "requests")
+    rows += requests_frame(app, 3).astype(str).to_numpy().tolist()
+    app.load_sheets(["requests"])
+    rows[-1][4] = "Approved"  # edited in the Sheet
+    ranges = recorded_ranges(sheet)
+    app.load_sheets(["requests"])
+    assert ranges == [["'requests'!A4:F"], ["'requests'!A1:F"]]
+    assert cached_rows(app, "requests") == rows[1:]
+
+
+def test_tail_read_resyncs_after_rows_were_deleted(app, sheet):
+    rows = sheet_rows(sheet, "requests")
+    rows += requests_frame(app, 3).astype(str).to_numpy().tolist()
+    app.load_sheets(["requests"])
+    del rows[1]
+    ranges = recorded_ranges(sheet)
+    app.load_sheets(["requests"])
+    assert len(ranges) == 2
+    assert cached_rows(app, "requests") == rows[1:]
@@ -0,0 +1,21 @@
+# tests/test_users.py
+"""UserIndex and logins against rows that went through the fake Sheet."""
+import pandas as pd
+
+
+def test_user_index_falls_back_to_a_duplicate_after_delete(app, sheet):
+    users = pd.DataFrame([["a", "x", "Student", "", ""], ["b", "x", "Student", "", ""], ["a", "y", "Admin", "", ""]],
+                         columns=app.sheets_info["users"])
+    app.sheet_cache.put("users", users)
+    app.sheet_cache.drop_row("users", 0)
+    assert app.user_index.by_name["a"] == ("a", "y", "Admin")
+
+
+def test_login_with_digit_text_survives_a_re_read(app, sheet):
+    app.append_row("users", ["007", "0123", "Student", "", "0987654321"])
+    app.write_queue.flush()
+    before = app.cached_df("users").iloc[0].tolist()
+    app.sheet_cache.invalidate("users")
+    assert app.cached_df("users").iloc[0].tolist() == before == ["007", "0123", "Student", "", "0987654321"]
+    assert app.authenticate("007", "0123") == ("Student", "007")
+    assert app.authenticate("7", "123") == (None, None)
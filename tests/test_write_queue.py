@@ -0,0 +1,83 @@
+# tests/test_write_queue.py
+"""WriteQueue against the fake Sheet: batching, resends and writes given up on."""
+import json
+
+from conftest import fail_next
+
+REQUEST = ["student1", "Student", "Library", "Book A", "Pending", "2024-05-01 10:00:00"]
+
+
+def data_rows(spreadsheet, name):
+    return spreadsheet.sheets[name].rows[1:]
+
+
+def test_writes_to_one_sheet_go_out_in_two_calls(app, sheet):
+    rows = [REQUEST[:3] + [f"Book {i}"] + REQUEST[4:] for i in range(3)]
+    for row in rows:
+        app.append_row("requests", row)
+    app.update_cell("requests", 1, "status", "Rejected")
+    app.update_cell("requests", 1, "status", "Approved")  # the last write to a cell wins
+    app.write_queue.flush()
+    assert sheet.calls["append_rows"] == 1
+    assert sheet.calls["batch_update"] == 1
+    assert [r[4] for r in data_rows(sheet, "requests")] == ["Pending", "Approved", "Pending"]
+
+
+def test_append_that_landed_before_failing_is_not_sent_again(app, sheet):
+    fail_next(sheet.sheets["requests"], "append_rows", 503, landed=True)
+    app.append_row("requests", REQUEST)
+    app.write_queue.flush()
+    assert data_rows(sheet, "requests") == [REQUEST]
+    assert not app.write_queue.failed
+
+
+def test_append_that_did_not_land_is_sent_again(app, sheet):
+    fail_next(sheet.sheets["requests"], "append_rows", 503)
+    app.append_row("requests", REQUEST)
+    app.write_queue.flush()
+    assert data_rows(sheet, "requests") == [REQUEST]
+
+
+def test_refused_append_is_sent_again(app, sheet):
+    fail_next(sheet.sheets["requests"], "append_rows", 429)
+    app.append_row("requests", REQUEST)
+    app.write_queue.flush()
+    assert data_rows(sheet, "requests") == [REQUEST]
+    assert sheet.calls["get"] == 1  # the row count; a 429 surely changed nothing, so no need to look
+
+
+def test_updates_wait_for_the_appends_they_follow(app, sheet):
+    fail_next(sheet.sheets["requests"], "append_rows", 503)
+    app.append_row("requests", REQUEST)
+    app.update_cell("requests", 0, "status", "Approved")
+    app.write_queue.flush()
+    assert data_rows(sheet, "requests") == [REQUEST[:4] + ["Approved", REQUEST[5]]]
+
+
+def test_rejected_write_is_kept_on_disk_and_reported(app, sheet):
+    fail_next(sheet.sheets["requests"], "append_rows", 400)
+    app.append_row("requests", REQUEST)
+    app.write_queue.flush()
+    assert data_rows(sheet, "requests") == []
+    assert [name for name, _ in app.write_queue.failed] == ["requests"]
+    with open(app.FAILED_WRITES_PATH, encoding="utf-8") as f:
+        kept = [json.loads(line) for line in f]
+    assert [(k["sheet"], k["op"], k["args"]) for k in kept] == [("requests", "append", REQUEST)]
+    assert not app.sheet_cache.is_fresh("requests")  # read again, without the lost row
+
+
+def test_one_sheet_failing_does_not_hold_back_another(app, sheet):
+    fail_next(sheet.sheets["requests"], "append_rows", 400)
+    app.append_row("requests", REQUEST)
+    app.append_row("payments", ["student1", "Tuition", 1000, "2024-05-01", "Pending"])
+    app.write_queue.flush()
+    assert data_rows(sheet, "payments") == [["student1", "Tuition", "1000", "2024-05-01", "Pending"]]
+
+
+def test_identical_row_above_the_append_does_not_count_as_landed(app, sheet):
+    row = ["admin", "Admin", "Rejected library request bob", "2024-05-01 10:00:00"]
+    sheet.sheets["recent_activity"].rows.append(list(row))
+    fail_next(sheet.sheets["recent_activity"], "append_rows", 503)
+    app.append_row("recent_activity", row)
+    app.write_queue.flush()
+    assert data_rows(sheet, "recent_activity") == [row, row]